@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+from models import Job
+
+
+def get(id) -> tuple:
+    job = Job.query.get_or_404(id)
+    return job.dump(), 200
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+import tasks
+import dataset
+from models import Job
+from models.job import JobTypeEnum
+
+
+def add(job: dict) -> tuple:
+    job_type = JobTypeEnum(job['type'])
+    filename = job.get('filename')
+    if job_type is JobTypeEnum.import_data:
+        if filename is None:
+            raise AssertionError('No `filename` provided')
+        if not tasks.data_path(filename).is_file():
+            raise AssertionError('File from `filename` does not exist')
+        dataset.import_format(filename)
+    elif filename is not None:
+        tasks.data_path(filename)
+        dataset.export_format(filename)
+    obj = Job(type=job_type, params={'filename': filename} if filename else {})
+    obj.save()
+    return obj.dump(), 202
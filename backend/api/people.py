@@ -1,13 +1,70 @@
 #!/usr/bin/env python3
-from models import Person
+from http import HTTPStatus
 
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
 
-def list() -> list:
-    people = Person.get_all()
-    return [person.dump() for person in people]
+import dataset
+import tracing
+from extensions import db
+from models import Person, PersonChange, IdempotencyKey
+from models.idempotency import IDEMPOTENCY_HEADER
 
 
-def add(person: dict) -> tuple:
+def list(batch: int = None, fields: list = None) -> list:
+    people = Person.get_all(import_batch=batch, fields=fields)
+    with tracing.span('Person.dump', **{'people.count': len(people)}):
+        return [person.dump(fields) for person in people]
+
+
+def export() -> Response:
+    if request.accept_mimetypes:
+        mimetype = request.accept_mimetypes.best_match(dataset.MIMETYPES)
+    else:
+        mimetype = dataset.MIMETYPES[0]
+    if mimetype is None:
+        abort(HTTPStatus.NOT_ACCEPTABLE, description=f'Supported formats: {", ".join(dataset.MIMETYPES)}')
+    return Response(stream_with_context(dataset.stream_columnar(mimetype)), mimetype=mimetype)
+
+
+def changes(since: str = '0.0', limit: int = 100) -> dict:
+    items = PersonChange.get_since(since, limit)
+    return {
+        'changes': [item.dump() for item in items],
+        'next': items[-1].token if items else since,
+    }
+
+
+def add(person: dict, user: str) -> tuple:
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        obj = Person.load(**person)
+        obj.save()
+        return obj.dump()
+
+    request_hash = IdempotencyKey.hash_request(person)
+    # `user` is `sub` of the verified credential (set by connexion), keys are scoped by it
+    stored = IdempotencyKey.lookup(user, key, current_app.config['IDEMPOTENCY_KEY_TTL'])
+    if stored is not None:
+        if stored.request_hash != request_hash:
+            abort(HTTPStatus.CONFLICT, description=f'`{IDEMPOTENCY_HEADER}` was already used with another request')
+        if not stored.completed:
+            abort(HTTPStatus.CONFLICT, description=f'Request with this `{IDEMPOTENCY_HEADER}` is in progress')
+        return stored.response, stored.status_code
+
+    # reserve the key in the same transaction as the insert, so a concurrent
+    # retry can never create a second person
+    record = IdempotencyKey(principal=user, key=key, request_hash=request_hash, status_code=HTTPStatus.OK)
+    try:
+        db.session.add(record)
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        abort(HTTPStatus.CONFLICT, description=f'Request with this `{IDEMPOTENCY_HEADER}` is in progress')
     obj = Person.load(**person)
-    obj.save()
-    return obj.dump()
+    # person, its key and the stored response are committed together, a failed commit leaves no
+    # key "in progress" behind and the retry adds the person again
+    obj.save(commit=False)
+    record.response = obj.dump()
+    record.save()
+    return record.response, record.status_code
@@ -1,20 +1,49 @@
 #!/usr/bin/env python3
+from flask import abort
+
+import tracing
+import similarity
 from models import Person
 
 
-def get(uuid) -> tuple:
-    person = Person.query.get_or_404(uuid)
-    return person.dump(), 200
+def get_or_404(uuid, fields=None):
+    person = Person.get(uuid, fields)
+    if person is None:
+        abort(404)
+    return person
+
+
+def get(uuid, fields: list = None) -> tuple:
+    person = get_or_404(uuid, fields)
+    with tracing.span('Person.dump', **{'people.count': 1}):
+        return person.dump(fields), 200
+
+
+def similar(uuid, k: int = 10, fields: list = None) -> list:
+    person = get_or_404(uuid)
+    nearest = similarity.get_index().nearest(similarity.person_features(person), k, exclude=person.uuid)
+    people = Person.get_many([key for key, distance in nearest], fields)
+    with tracing.span('Person.dump', **{'people.count': len(people)}):
+        return [obj.dump(fields) for obj in people]
 
 
 def update(uuid, person) -> tuple:
-    obj = Person.query.get_or_404(uuid)
-    obj.update(**person)
-    obj.save()
+    obj = get_or_404(uuid)
+    # like patch, replacing a person with the same values writes nothing
+    if obj.update(**person):
+        obj.save()
+    return obj.dump(), 200
+
+
+def patch(uuid, person) -> tuple:
+    obj = get_or_404(uuid)
+    # no-op patch doesn't write anything (nor change event), only changed columns are updated
+    if obj.update(**person):
+        obj.save()
     return obj.dump(), 200
 
 
 def delete(uuid) -> tuple:
-    obj = Person.query.get_or_404(uuid)
+    obj = get_or_404(uuid)
     obj.delete()
     return {}, 200
@@ -5,7 +5,13 @@ from http import HTTPStatus
 from flask import jsonify
 from sqlalchemy.exc import SQLAlchemyError
 
-from commands import run_unitest, import_data, check_migration, check_db_connection
+from commands import run_unitest, import_data, export_data, check_migration, check_db_connection, \
+    evict_idempotency_keys, worker, partitions_group, create_api_key, revoke_api_key
+import auth
+import tracing
+import deadlines
+import similarity
+import partitions
 from config import app_config
 from extensions import db, migrate, PathLocationResolver
 
@@ -28,9 +34,10 @@ def create_app(config_name):
 
     # initialize API
     connexion_app.add_api('swagger.yml',
-                          resolver=PathLocationResolver(prefix='api'),
+                          resolver=PathLocationResolver(prefix='api', decorators=[tracing.traced, deadlines.guarded]),
                           strict_validation=True,
-                          validate_responses=True)
+                          validate_responses=True,
+                          validator_map=tracing.VALIDATOR_MAP)
 
     # register exception handler
     register_error_handlers(flask_app)
@@ -48,7 +55,11 @@ def create_app(config_name):
 def register_extensions(app):
     """register data base and migrations object"""
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, include_object=partitions.include_object)
+    auth.init_app(app)
+    tracing.init_app(app)
+    deadlines.init_app(app)
+    similarity.init_app(app)
 
 
 def register_error_handlers(app):
@@ -66,11 +77,27 @@ def register_error_handlers(app):
     @app.errorhandler(SQLAlchemyError)
     def handle_sql_alchemy_error(error):
         db.session.rollback()
+        if deadlines.is_timeout(error):
+            status = HTTPStatus.GATEWAY_TIMEOUT
+        elif deadlines.is_disconnect(error):
+            status = HTTPStatus.SERVICE_UNAVAILABLE
+        else:
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
         resp = jsonify({"detail": str(error),
-                        "status": HTTPStatus.INTERNAL_SERVER_ERROR,
-                        "title": "Internal Server Error",
+                        "status": status,
+                        "title": status.phrase,
                         "type": "orm"})
-        resp.status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+        resp.status_code = status
+        return resp
+
+    @app.errorhandler(deadlines.DeadlineExceeded)
+    def handle_deadline_exceeded(error):
+        db.session.rollback()
+        resp = jsonify({"detail": str(error),
+                        "status": HTTPStatus.GATEWAY_TIMEOUT,
+                        "title": "Gateway Timeout",
+                        "type": "deadline"})
+        resp.status_code = HTTPStatus.GATEWAY_TIMEOUT
         return resp
 
     @app.errorhandler(HTTPStatus.NOT_FOUND)
@@ -100,10 +127,34 @@ def register_error_handlers(app):
         resp.status_code = HTTPStatus.FORBIDDEN
         return resp
 
+    @app.errorhandler(HTTPStatus.NOT_ACCEPTABLE)
+    def handle_406(error):
+        resp = jsonify({"detail": str(error),
+                        "status": HTTPStatus.NOT_ACCEPTABLE,
+                        "title": "Not Acceptable",
+                        "type": "http"})
+        resp.status_code = HTTPStatus.NOT_ACCEPTABLE
+        return resp
+
+    @app.errorhandler(HTTPStatus.CONFLICT)
+    def handle_409(error):
+        resp = jsonify({"detail": str(error),
+                        "status": HTTPStatus.CONFLICT,
+                        "title": "Conflict",
+                        "type": "http"})
+        resp.status_code = HTTPStatus.CONFLICT
+        return resp
+
 
 def register_commands(app):
     """Register extra command"""
     app.cli.add_command(run_unitest)
     app.cli.add_command(import_data)
+    app.cli.add_command(export_data)
     app.cli.add_command(check_migration)
     app.cli.add_command(check_db_connection)
+    app.cli.add_command(evict_idempotency_keys)
+    app.cli.add_command(worker)
+    app.cli.add_command(partitions_group)
+    app.cli.add_command(create_api_key)
+    app.cli.add_command(revoke_api_key)
@@ -0,0 +1,129 @@
+"""
+Authentication of API requests, functions referenced by `securityDefinitions` in `swagger.yml`.
+
+Clients send either `X-API-Key` header (keys from `API_KEYS` setting or `api_key` table) or
+`Authorization: Bearer <JWT>` signed by one of keys from local JWKS file (`JWKS_FILE`).
+Verified keys and tokens are kept in a bounded TTL cache, so only the first request with
+a given credential pays for the DB lookup or signature check.
+"""
+import json
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import jwt
+from flask import current_app
+
+from models.api_key import ApiKey
+
+
+class TTLCache:
+    """Thread-safe LRU cache with bounded size, entries expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= self.timer():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, self.timer() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def load_jwks(filename):
+    """Return public keys and their algorithms (`alg` member is required) by key id."""
+    keys = {}
+    for data in json.loads(Path(filename).read_text())['keys']:
+        if 'alg' not in data:
+            raise ValueError(f'No `alg` for key `{data.get("kid")}` in {filename}')
+        keys[data.get('kid')] = (jwt.PyJWK.from_dict(data).key, data['alg'])
+    return keys
+
+
+class Authenticator:
+    """Verifies API keys and JWTs of one app, keeps verified credentials in `cache`."""
+
+    def __init__(self, app):
+        self.cache = TTLCache(app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL'])
+        self.key_hashes = {ApiKey.hash_key(key) for key in app.config['API_KEYS']}
+        self.jwks = load_jwks(app.config['JWKS_FILE']) if app.config['JWKS_FILE'] else {}
+        self.audience = app.config['JWT_AUDIENCE']
+        self.issuer = app.config['JWT_ISSUER']
+
+    def verify_api_key(self, key):
+        key_hash = ApiKey.hash_key(key)
+        if key_hash in self.key_hashes:
+            return {'sub': 'config'}
+        obj = ApiKey.lookup(key)
+        if obj is None:
+            return None
+        return {'sub': obj.name}
+
+    def verify_token(self, token):
+        """Return claims of valid token and number of seconds it stays valid."""
+        try:
+            key, algorithm = self.jwks[jwt.get_unverified_header(token).get('kid')]
+            # algorithm comes from the key, not from the token header
+            claims = jwt.decode(token, key, algorithms=[algorithm],
+                                audience=self.audience, issuer=self.issuer,
+                                options={'require': ['exp', 'sub']})
+        except (jwt.InvalidTokenError, KeyError):
+            return None, 0
+        return claims, claims['exp'] - time.time()
+
+    def api_key_info(self, key):
+        info = self.cache.get(('api_key', key))
+        if info is None:
+            info = self.verify_api_key(key)
+            if info is not None:
+                self.cache.set(('api_key', key), info)
+        return info
+
+    def bearer_info(self, token):
+        info = self.cache.get(('token', token))
+        if info is None:
+            info, ttl = self.verify_token(token)
+            if info is not None:
+                # cached token must not outlive its `exp` claim
+                self.cache.set(('token', token), info, ttl)
+        return info
+
+
+def init_app(app):
+    app.extensions['auth'] = Authenticator(app)
+
+
+def api_key_info(key, required_scopes=None):
+    return current_app.extensions['auth'].api_key_info(key)
+
+
+def bearer_info(token):
+    return current_app.extensions['auth'].bearer_info(token)
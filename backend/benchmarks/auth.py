@@ -0,0 +1,122 @@
+"""
+Compare throughput of `GET /people/{uuid}` without authentication and with API keys or JWT, cached and not.
+
+    APP_SETTINGS=development python -m benchmarks.auth --requests 5000
+
+Requests are sent through the Flask test client, so numbers show the cost of the app itself without network.
+The baseline ("none") replaces credential verification with a function which accepts every request. Rows "uncached"
+clear the cache before every request, so each of them pays for the DB lookup or RSA signature check.
+The second table shows the cost of the verification call alone.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import auth
+from app import create_app
+from extensions import db
+from models import ApiKey, Person
+
+
+class NoAuthenticator:
+    def api_key_info(self, key):
+        return {'sub': 'anonymous'}
+
+
+def run(client, path, headers, count, before=None):
+    start = time.perf_counter()
+    for _ in range(count):
+        if before is not None:
+            before()
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.status_code
+    return count / (time.perf_counter() - start)
+
+
+def timeit(func, count, before=None):
+    start = time.perf_counter()
+    for _ in range(count):
+        if before is not None:
+            before()
+        func()
+    return (time.perf_counter() - start) / count * 10 ** 6
+
+
+def forget(authenticator):
+    """Drop verified credentials and objects loaded by the session, the next verification goes to DB."""
+    authenticator.cache.clear()
+    db.session.expunge_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='number of requests per variant')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('APP_SETTINGS', 'development')).app
+    app.config['SQLALCHEMY_ECHO'] = False
+    with app.app_context(), tempfile.TemporaryDirectory() as folder:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwks_file = Path(folder) / 'jwks.json'
+        jwks_file.write_text(json.dumps({'keys': [dict(jwk, kid='benchmark', alg='RS256')]}))
+        app.config['JWKS_FILE'] = str(jwks_file)
+        auth.init_app(app)
+        authenticator = app.extensions['auth']
+        token = jwt.encode({'sub': 'benchmark', 'exp': int(time.time()) + 3600}, private_key,
+                           algorithm='RS256', headers={'kid': 'benchmark'})
+
+        person = Person.load(name='Benchmark', sex='male', age=30, passengerClass=1, survived=True,
+                             siblingsOrSpousesAboard=0, parentsOrChildrenAboard=0, fare=10.0)
+        person.save()
+        api_key, key = ApiKey.create(f'benchmark-{person.uuid}')
+        path = f'/people/{person.uuid}'
+        client = app.test_client()
+        try:
+            # warm up connection pool and caches of connexion
+            run(client, path, {'X-API-Key': key}, 100)
+            app.extensions['auth'] = NoAuthenticator()
+            results = {'none': run(client, path, {'X-API-Key': 'anything'}, args.requests)}
+            app.extensions['auth'] = authenticator
+            results.update({
+                'api key': run(client, path, {'X-API-Key': key}, args.requests),
+                'api key uncached': run(client, path, {'X-API-Key': key}, args.requests,
+                                        lambda: forget(authenticator)),
+                'jwt': run(client, path, {'Authorization': f'Bearer {token}'}, args.requests),
+                'jwt uncached': run(client, path, {'Authorization': f'Bearer {token}'}, args.requests,
+                                    authenticator.cache.clear),
+            })
+            with app.test_request_context():
+                calls = {
+                    'api key': timeit(lambda: authenticator.api_key_info(key), args.requests),
+                    'api key uncached': timeit(lambda: authenticator.api_key_info(key), args.requests,
+                                               lambda: forget(authenticator)),
+                    'jwt': timeit(lambda: authenticator.bearer_info(token), args.requests),
+                    'jwt uncached': timeit(lambda: authenticator.bearer_info(token), args.requests,
+                                           authenticator.cache.clear),
+                }
+        finally:
+            db.session.rollback()
+            Person.query.get(person.uuid).delete()
+            ApiKey.query.get(api_key.key_hash).delete()
+
+        print(f'{args.requests} requests per variant')
+        print(f'{"auth":<20}{"requests/s":>12}{"overhead [us]":>16}')
+        for name, throughput in results.items():
+            overhead = (1 / throughput - 1 / results['none']) * 10 ** 6
+            print(f'{name:<20}{throughput:>12.0f}{overhead:>16.1f}')
+        print()
+        print(f'{"verification":<20}{"call [us]":>12}')
+        for name, duration in calls.items():
+            print(f'{name:<20}{duration:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
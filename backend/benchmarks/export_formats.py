@@ -0,0 +1,85 @@
+"""
+Compare size, export time and pandas load time of people exported as JSON, CSV, Arrow and Parquet.
+
+    APP_SETTINGS=development python -m benchmarks.export_formats --seed 1000000
+
+Option `--seed` adds random people to the database before the measurement. Requires `pandas`.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import dataset
+from app import create_app
+from extensions import db
+from models import Person
+
+
+def seed(count, batch_size=dataset.BATCH_SIZE):
+    for start in range(0, count, batch_size):
+        db.engine.execute(Person.__table__.insert(), [dict(
+            survived=random.random() < 0.4,
+            passenger_class=random.randint(1, 3),
+            name=f'Passenger {start + i}',
+            sex=random.choice(['male', 'female']),
+            age=random.randint(1, 80),
+            siblings_or_spouses_aboard=random.randint(0, 5),
+            parents_or_children_aboard=random.randint(0, 5),
+            fare=round(random.uniform(5, 500), 4),
+        ) for i in range(min(batch_size, count - start))])
+
+
+def export_json(filename):
+    # the same work as `GET /people`
+    Path(filename).write_text(json.dumps([person.dump() for person in Person.get_all()]))
+    db.session.remove()
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='number of random people added before measurement')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('APP_SETTINGS', 'development')).app
+    app.config['SQLALCHEMY_ECHO'] = False
+    with app.app_context(), tempfile.TemporaryDirectory() as folder:
+        if args.seed:
+            seed(args.seed)
+        rows = Person.query.count()
+        files = {name: Path(folder) / name for name in ('people.json', 'people.csv', 'people.arrow', 'people.parquet')}
+        exports = {
+            'people.json': lambda: export_json(files['people.json']),
+            'people.csv': lambda: dataset.export_file(files['people.csv']),
+            'people.arrow': lambda: dataset.export_file(files['people.arrow']),
+            'people.parquet': lambda: dataset.export_file(files['people.parquet']),
+        }
+        loads = {
+            'people.json': lambda: pd.read_json(files['people.json']),
+            'people.csv': lambda: pd.read_csv(files['people.csv']),
+            'people.arrow': lambda: pa.ipc.open_file(str(files['people.arrow'])).read_pandas(),
+            'people.parquet': lambda: pd.read_parquet(files['people.parquet']),
+        }
+        print(f'{rows} rows')
+        print(f'{"file":<16}{"size [MB]":>12}{"export [s]":>12}{"load [s]":>12}')
+        for name, path in files.items():
+            export_time = timeit(exports[name])
+            load_time = timeit(loads[name])
+            size = path.stat().st_size / 2 ** 20
+            print(f'{name:<16}{size:>12.2f}{export_time:>12.3f}{load_time:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare per-call cost of hot queries built by the ORM on every call and through the bakery of `Person`.
+
+    APP_SETTINGS=development python -m benchmarks.orm_queries --calls 5000
+
+The session is emptied before every call, so each of them goes to DB (otherwise `get` returns the object from
+the identity map). The batch filter matches no rows, so the row shows construction and compilation of the query
+alone. "round trip" is `SELECT 1` sent through the same session, the floor of every query.
+"""
+import os
+import time
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.orm import load_only
+
+from app import create_app
+from extensions import db
+from models import Person
+
+
+FIELDS = ['name', 'age']
+MISSING_BATCH = -1
+
+
+def timeit(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        db.session.expunge_all()
+        func()
+    return (time.perf_counter() - start) / count * 10 ** 6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=5000, help='number of calls per query')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('APP_SETTINGS', 'development')).app
+    app.config['SQLALCHEMY_ECHO'] = False
+    with app.app_context():
+        person = Person.load(name='Benchmark', sex='male', age=30, passengerClass=1, survived=True,
+                             siblingsOrSpousesAboard=0, parentsOrChildrenAboard=0, fare=10.0)
+        person.save()
+        uuid = person.uuid
+        columns = [Person.to_snake_case(name) for name in FIELDS]
+        queries = {
+            'get': (lambda: Person.query.get(uuid),
+                    lambda: Person.get(uuid)),
+            'get fields': (lambda: Person.query.options(load_only(*columns)).get(uuid),
+                           lambda: Person.get(uuid, FIELDS)),
+            'get_all batch': (lambda: Person.query.filter(Person.import_batch == MISSING_BATCH).all(),
+                              lambda: Person.get_all(import_batch=MISSING_BATCH)),
+            'get_all batch fields': (
+                lambda: Person.query.options(load_only(*columns)).filter(Person.import_batch == MISSING_BATCH).all(),
+                lambda: Person.get_all(import_batch=MISSING_BATCH, fields=FIELDS)),
+        }
+        try:
+            round_trip = timeit(lambda: db.session.execute(text('SELECT 1')), args.calls)
+            results = {}
+            for name, (query, baked) in queries.items():
+                # warm up, the first baked call compiles and caches SQL
+                timeit(query, 100)
+                timeit(baked, 100)
+                results[name] = (timeit(query, args.calls), timeit(baked, args.calls))
+        finally:
+            db.session.rollback()
+            Person.query.get(uuid).delete()
+
+        print(f'{args.calls} calls per query')
+        print(f'{"query":<24}{"query [us]":>12}{"baked [us]":>12}{"saved [us]":>12}')
+        print(f'{"round trip":<24}{round_trip:>12.1f}')
+        for name, (query, baked) in results.items():
+            print(f'{name:<24}{query:>12.1f}{baked:>12.1f}{query - baked:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
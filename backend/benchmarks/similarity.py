@@ -0,0 +1,81 @@
+"""
+Measure memory footprint and latency of the similarity index filled with random people.
+
+    python -m benchmarks.similarity --rows 1000000 --queries 200
+
+Features are drawn from ranges of the Titanic dataset, the database is not used. Memory is measured with
+tracemalloc (NumPy arrays and the uuid -> row dict), query latency includes the distance to every row,
+selection of `k` nearest and their sort.
+"""
+import os
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+import similarity
+
+
+def random_people(rows, generator):
+    uuids = np.frombuffer(os.urandom(16 * rows), dtype='V16')
+    matrix = np.column_stack([
+        generator.integers(1, 4, rows),
+        generator.integers(0, 81, rows),
+        generator.uniform(0, 512, rows),
+        generator.integers(0, 9, rows),
+        generator.integers(0, 7, rows),
+        generator.choice(list(similarity.SEX_VALUES.values()), rows),
+    ]).astype(np.float32)
+    return uuids, matrix
+
+
+def percentiles(durations):
+    return [np.percentile(durations, percentile) * 1000 for percentile in (50, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='number of people in the index')
+    parser.add_argument('--queries', type=int, default=200, help='number of queries and updates')
+    parser.add_argument('-k', type=int, default=10, help='number of similar people')
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(0)
+    uuids, matrix = random_people(args.rows, generator)
+    index = similarity.SimilarityIndex()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index.load(uuids, matrix, '0.0')
+    load = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    keys = [key for key, distance in index.nearest(matrix[0], args.queries)]
+    queries = []
+    for row in generator.integers(0, args.rows, args.queries):
+        start = time.perf_counter()
+        index.nearest(matrix[row], args.k)
+        queries.append(time.perf_counter() - start)
+    upserts, removes = [], []
+    for key in keys:
+        start = time.perf_counter()
+        index.upsert(key, matrix[1])
+        upserts.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.remove(key)
+        removes.append(time.perf_counter() - start)
+
+    print(f'{args.rows} rows, {len(similarity.FEATURES)} features, k={args.k}')
+    print(f'load: {load:.2f} s')
+    print(f'memory: {memory / 2 ** 20:.1f} MB (matrix {index.matrix.nbytes / 2 ** 20:.1f} MB, '
+          f'uuids {index.uuids.nbytes / 2 ** 20:.1f} MB)')
+    print(f'{"operation":<12}{"p50 [ms]":>10}{"p99 [ms]":>10}')
+    for name, durations in (('nearest', queries), ('upsert', upserts), ('remove', removes)):
+        p50, p99 = percentiles(durations)
+        print(f'{name:<12}{p50:>10.3f}{p99:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare insert time, WAL volume and primary key index size of random (uuid4) and time-ordered (uuid7) keys.
+
+    APP_SETTINGS=development python -m benchmarks.uuid_keys --rows 1000000
+
+Every variant inserts rows in batches (like `import_data`) into its own table with a uuid primary key,
+which is dropped after the measurement.
+"""
+import os
+import time
+import uuid
+import argparse
+
+from sqlalchemy import Column, MetaData, String, Table, text
+from sqlalchemy.dialects.postgresql import UUID
+
+import dataset
+from app import create_app
+from extensions import db
+from models.person import generate_uuid
+
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': generate_uuid,
+}
+
+
+def measure(name, generate, rows, batch_size):
+    table = Table(f'benchmark_{name}', MetaData(),
+                  Column('uuid', UUID(as_uuid=True), primary_key=True),
+                  Column('name', String(100), nullable=False))
+    table.drop(db.engine, checkfirst=True)
+    table.create(db.engine)
+    # the same multi-row insert as `import_data`
+    insert = table.insert()
+    wal_start = db.engine.execute(text('SELECT pg_current_wal_lsn()')).scalar()
+    start = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        with db.engine.begin() as conn:
+            conn.execute(insert, [dict(uuid=generate(), name=f'Passenger {offset + i}')
+                                  for i in range(min(batch_size, rows - offset))])
+    elapsed = time.perf_counter() - start
+    wal, index_size = db.engine.execute(text(
+        f"SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :start), pg_relation_size('{table.name}_pkey')"
+    ), start=wal_start).first()
+    table.drop(db.engine)
+    return elapsed, float(wal), index_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='number of inserted rows')
+    parser.add_argument('--batch-size', type=int, default=dataset.BATCH_SIZE, help='rows inserted per transaction')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('APP_SETTINGS', 'development')).app
+    app.config['SQLALCHEMY_ECHO'] = False
+    with app.app_context():
+        print(f'{args.rows} rows')
+        print(f'{"key":<8}{"insert [s]":>12}{"rows/s":>12}{"WAL [MB]":>12}{"index [MB]":>12}')
+        for name, generate in GENERATORS.items():
+            elapsed, wal, index_size = measure(name, generate, args.rows, args.batch_size)
+            print(f'{name:<8}{elapsed:>12.3f}{args.rows / elapsed:>12.0f}{wal / 2 ** 20:>12.2f}{index_size / 2 ** 20:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
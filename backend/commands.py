@@ -1,6 +1,8 @@
+import os
 import sys
-import csv
+import time
 import unittest
+import subprocess
 from pathlib import Path
 
 import click
@@ -13,18 +15,59 @@ from alembic.config import Config
 from alembic.runtime.migration import MigrationContext
 
 import models
+import tasks
+import dataset
+import partitions
 from extensions import db, create_testing_db
 
 
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+def run_shards(verbose, path, workers):
+    """Run tests in `workers` processes, each of them with own database."""
+    for worker in range(workers):
+        create_testing_db(worker)
+    processes = [subprocess.Popen(
+        [sys.executable, '-m', 'flask', 'test', '--path', path, '--shard', str(worker), str(workers),
+         '-' + 'v' * verbose],
+        env={**os.environ, 'TEST_WORKER': str(worker)},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True) for worker in range(workers)]
+    success = True
+    for worker, process in enumerate(processes):
+        output, _ = process.communicate()
+        print(f'Worker {worker}:\n{output}')
+        success = success and process.returncode == 0
+    return success
+
+
 @click.command(name='test')
 @click.option('-v', '--verbose', count=True, default=1)
 @click.option('-p', '--path', type=click.Path(exists=True), default='tests')
+@click.option('-w', '--workers', type=int, default=1, help='Number of processes which run tests in parallel.')
+@click.option('--shard', type=(int, int), default=(None, None), hidden=True)
 @with_appcontext
-def run_unitest(verbose, path):
+def run_unitest(verbose, path, workers, shard):
     """Run the tests."""
-    create_testing_db()
-    suite = unittest.TestLoader().discover(path)
-    unittest.TextTestRunner(verbosity=verbose).run(suite)
+    start = time.perf_counter()
+    if workers > 1:
+        success = run_shards(verbose, path, workers)
+    else:
+        worker, total = shard
+        create_testing_db(worker)
+        suite = unittest.TestLoader().discover(path)
+        if total:
+            suite = unittest.TestSuite(list(iter_tests(suite))[worker::total])
+        success = unittest.TextTestRunner(verbosity=verbose).run(suite).wasSuccessful()
+    print(f'Wall-clock time: {time.perf_counter() - start:.3f}s')
+    sys.exit(0 if success else 1)
 
 
 @click.command(name='check_migration')
@@ -58,28 +101,123 @@ def check_db_connection():
 
 @click.command()
 @click.argument('filename', type=click.Path(exists=True))
+@click.option('-b', '--batch', type=click.IntRange(min=0), default=0, help='Import batch (partition) of people.')
+@with_appcontext
+def import_data(filename, batch):
+    """Import data from csv (also gzip or zstd compressed), arrow or parquet file."""
+    try:
+        dataset.import_format(filename)
+    except AssertionError as error:
+        raise click.BadParameter(str(error), param_hint='filename')
+    dataset.import_file(filename, progress=lambda count, total=None: print(f'Imported: {count} items'),
+                        import_batch=batch)
+
+
+@click.command()
+@click.argument('filename', type=click.Path(dir_okay=False, writable=True))
+@with_appcontext
+def export_data(filename):
+    """Export data to csv, arrow or parquet file (chosen by file extension)."""
+    if Path(filename).suffix not in dataset.FORMATS:
+        raise click.BadParameter(f'supported extensions: {", ".join(dataset.FORMATS)}', param_hint='filename')
+    count = dataset.export_file(filename, progress=lambda count, total=None: print(f'Exported: {count}/{total} items'))
+    print(f'Exported: {count} items to {filename}')
+
+
+@click.command(name='evict_idempotency_keys')
+@click.option('-t', '--ttl', type=int, default=None, help='Max age of key in seconds.')
+@with_appcontext
+def evict_idempotency_keys(ttl):
+    """Remove expired idempotency keys."""
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL') if ttl is None else ttl
+    count = models.IdempotencyKey.evict(ttl)
+    print(f'Removed: {count} keys')
+
+
+@click.command(name='create_api_key')
+@click.argument('name')
+@with_appcontext
+def create_api_key(name):
+    """Generate API key for a client, only its hash is stored."""
+    _, key = models.ApiKey.create(name)
+    print(key)
+
+
+@click.command(name='revoke_api_key')
+@click.argument('name')
+@with_appcontext
+def revoke_api_key(name):
+    """Remove API key of a client (already verified key is accepted until `AUTH_CACHE_TTL` passes)."""
+    obj = models.ApiKey.query.filter_by(name=name).first()
+    if obj is None:
+        raise click.BadParameter(f'No API key named `{name}`', param_hint='name')
+    obj.delete()
+    print(f'Revoked: {name}')
+
+
+@click.command(name='worker')
+@click.option('-c', '--concurrency', type=int, default=1, help='Number of jobs run at the same time.')
+@click.option('-i', '--interval', type=float, default=1.0, help='Seconds between polls of empty queue.')
+@click.option('-b', '--burst', is_flag=True, help='Exit when the queue is empty.')
+@with_appcontext
+def worker(concurrency, interval, burst):
+    """Run background jobs (imports and exports)."""
+    tasks.work(current_app._get_current_object(), concurrency=concurrency, interval=interval, burst=burst)
+
+
+@click.group(name='partitions')
+def partitions_group():
+    """Manage partitions of person table (one per import batch)."""
+
+
+def _run_partition_command(func, *args):
+    try:
+        func(*args)
+    except AssertionError as error:
+        raise click.ClickException(str(error))
+    db.session.commit()
+
+
+@partitions_group.command(name='list')
+@with_appcontext
+def list_partitions():
+    """Show partitions of person table."""
+    if not partitions.is_partitioned():
+        print('Table is not partitioned')
+    for name in partitions.get_all():
+        print(name)
+
+
+@partitions_group.command(name='convert')
+@with_appcontext
+def convert_partitions():
+    """Convert person table to partitioned one, existing rows stay in the partition of batch 0."""
+    _run_partition_command(partitions.convert)
+    print('Converted')
+
+
+@partitions_group.command(name='create')
+@click.argument('batch', type=click.IntRange(min=1))
+@with_appcontext
+def create_partition(batch):
+    """Create partition for import batch."""
+    _run_partition_command(partitions.create, batch)
+    print(f'Created: {partitions.partition_name(batch)}')
+
+
+@partitions_group.command(name='detach')
+@click.argument('batch', type=click.IntRange(min=1))
+@with_appcontext
+def detach_partition(batch):
+    """Detach partition of import batch, its people are no longer served but the table is kept."""
+    _run_partition_command(partitions.detach, batch)
+    print(f'Detached: {partitions.partition_name(batch)}')
+
+
+@partitions_group.command(name='drop')
+@click.argument('batch', type=click.IntRange(min=1))
 @with_appcontext
-def import_data(filename):
-    """Import data from csv file."""
-    with Path(filename).open() as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        next(csv_reader)  # skip header
-        buffer, count = [], 0
-        for row in csv_reader:
-            count += 1
-            survived, pclass, name, sex, age, siblings, parents, fare = row
-            buffer.append(models.Person(
-                survived=bool(survived), passenger_class=int(pclass),
-                name=name, sex=sex, age=int(float(age)),
-                siblings_or_spouses_aboard=int(float(siblings)),
-                parents_or_children_aboard=int(parents),
-                fare=float(fare)))
-            if len(buffer) % 10000 == 0:
-                print(f'Imported: {count} items')
-                db.session.bulk_save_objects(buffer)
-                db.session.commit()
-                buffer = []
-        if buffer:
-            print(f'Imported: {count} items')
-            db.session.bulk_save_objects(buffer)
-            db.session.commit()
+def drop_partition(batch):
+    """Drop partition of import batch with all its people."""
+    _run_partition_command(partitions.drop, batch)
+    print(f'Dropped: {partitions.partition_name(batch)}')
@@ -20,6 +20,41 @@ class BaseConfig:
     SQLALCHEMY_ECHO = env.bool("SQLALCHEMY_ECHO", default=False)
     SQLALCHEMY_DATABASE_URI = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}'
     SQLALCHEMY_TRACK_MODIFICATIONS = env.bool('SQLALCHEMY_TRACK_MODIFICATIONS', default=False)
+    # bulk inserts are sent as one `INSERT ... VALUES (...), (...)` instead of statement per row
+    SQLALCHEMY_ENGINE_OPTIONS = {'executemany_mode': 'values'}
+
+    # Idempotency keys (seconds)
+    IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', default=86400)
+
+    # Background jobs, all imported and exported files are kept in this folder
+    JOB_DATA_DIR = env('JOB_DATA_DIR', default='data')
+    # seconds between heartbeats of running job, without heartbeat for `JOB_TIMEOUT` it is run again (at most
+    # `JOB_MAX_ATTEMPTS` times)
+    JOB_HEARTBEAT_INTERVAL = env.float('JOB_HEARTBEAT_INTERVAL', default=30.0)
+    JOB_TIMEOUT = env.float('JOB_TIMEOUT', default=300.0)
+    JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=3)
+
+    # Authentication, API keys (besides keys in `api_key` table) and JWKS file with keys of JWT issuers
+    API_KEYS = env.list('API_KEYS', default=[])
+    JWKS_FILE = env('JWKS_FILE', default=None)
+    JWT_AUDIENCE = env('JWT_AUDIENCE', default=None)
+    JWT_ISSUER = env('JWT_ISSUER', default=None)
+    # verified keys and tokens (seconds, number of entries)
+    AUTH_CACHE_TTL = env.int('AUTH_CACHE_TTL', default=300)
+    AUTH_CACHE_SIZE = env.int('AUTH_CACHE_SIZE', default=10000)
+
+    # Deadline of API operations (seconds, `x-deadline` in swagger.yml overrides it), retries of transient DB errors
+    REQUEST_TIMEOUT = env.float('REQUEST_TIMEOUT', default=30.0)
+    RETRY_ATTEMPTS = env.int('RETRY_ATTEMPTS', default=3)
+    RETRY_BACKOFF = env.float('RETRY_BACKOFF', default=0.05)
+
+    # Tracing, exporter: none, console or file (one JSON span per line), ratio of sampled new traces
+    TRACING_EXPORTER = env('TRACING_EXPORTER', default='none')
+    TRACING_FILE = env('TRACING_FILE', default='traces.jsonl')
+    TRACING_SAMPLE_RATIO = env.float('TRACING_SAMPLE_RATIO', default=1.0)
+
+    # Similarity index is rebuilt from the table when more outbox changes are waiting
+    SIMILARITY_REBUILD_THRESHOLD = env.int('SIMILARITY_REBUILD_THRESHOLD', default=10000)
 
 
 class ProductionConfig(BaseConfig):
@@ -41,8 +76,12 @@ class TestingConfig(BaseConfig):
     """Test configuration."""
     TESTING = True
     PRESERVE_CONTEXT_ON_EXCEPTION = False
-    SQLALCHEMY_DATABASE_URI = f'postgresql://{BaseConfig.DB_USERNAME}:{BaseConfig.DB_PASSWORD}@{BaseConfig.DB_HOSTNAME}:{BaseConfig.DB_PORT}/test_{BaseConfig.DB_NAME}'
+    # each process of sharded test run has own database
+    TEST_WORKER = env('TEST_WORKER', default=None)
+    TEST_DB_NAME = f'test_{BaseConfig.DB_NAME}_{TEST_WORKER}' if TEST_WORKER else f'test_{BaseConfig.DB_NAME}'
+    SQLALCHEMY_DATABASE_URI = f'postgresql://{BaseConfig.DB_USERNAME}:{BaseConfig.DB_PASSWORD}@{BaseConfig.DB_HOSTNAME}:{BaseConfig.DB_PORT}/{TEST_DB_NAME}'
     SQLALCHEMY_ECHO = False
+    API_KEYS = ['testing']
 
 
 app_config = {
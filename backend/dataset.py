@@ -0,0 +1,320 @@
+import csv
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import String, cast, select, text
+
+import models
+import partitions
+import similarity
+from models.person import SexEnum, generate_uuid
+from extensions import db
+
+
+BATCH_SIZE = 10000
+CSV_HEADER = ['Survived', 'Pclass', 'Name', 'Sex', 'Age', 'Siblings/Spouses Aboard', 'Parents/Children Aboard', 'Fare']
+
+# columnar exports use the same field names as the API
+SCHEMA = pa.schema([
+    ('uuid', pa.string()),
+    ('survived', pa.bool_()),
+    ('passengerClass', pa.int32()),
+    ('name', pa.string()),
+    ('sex', pa.string()),
+    ('age', pa.int32()),
+    ('siblingsOrSpousesAboard', pa.int32()),
+    ('parentsOrChildrenAboard', pa.int32()),
+    ('fare', pa.float64()),
+])
+
+# database column names in `SCHEMA` order
+COLUMN_NAMES = [models.Person.to_snake_case(name) for name in SCHEMA.names]
+
+# csv header of titanic data set to api names
+CSV_NAMES = dict(zip(CSV_HEADER, SCHEMA.names[1:]))
+
+UUID_PATTERN = '^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+
+CSV_BLOCK_SIZE = 1 << 20
+CSV_COLUMN_TYPES = {
+    **{field.name: field.type for field in SCHEMA},
+    **{name: SCHEMA.field(field).type for name, field in CSV_NAMES.items()},
+    # ages of infants are fractional, they are truncated to full years
+    'age': pa.float64(),
+    'Age': pa.float64(),
+}
+TRUNCATED = {'age'}
+
+ARROW = 'application/vnd.apache.arrow.stream'
+ARROW_FILE = 'application/vnd.apache.arrow.file'
+PARQUET = 'application/vnd.apache.parquet'
+CSV = 'text/csv'
+
+# formats served by the api, in order of preference
+MIMETYPES = [ARROW, PARQUET, CSV]
+
+FORMATS = {
+    '.arrow': ARROW_FILE,
+    '.arrows': ARROW,
+    '.parquet': PARQUET,
+    '.csv': CSV,
+}
+
+COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+
+def is_numeric(data_type):
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+def _no_progress(count, total=None):
+    pass
+
+
+def import_format(filename):
+    """Return format and compression of imported file, chosen by file extension (e.g. `.csv.gz`)."""
+    suffixes = Path(filename).suffixes
+    compression = COMPRESSIONS.get(suffixes[-1]) if suffixes else None
+    if compression:
+        suffixes = suffixes[:-1]
+    mimetype = FORMATS.get(suffixes[-1]) if suffixes else None
+    if mimetype is None or (compression and mimetype != CSV):
+        raise AssertionError('Incorrect file extension, supported: '
+                             f'{", ".join(FORMATS)}, {", ".join(".csv" + item for item in COMPRESSIONS)}')
+    return mimetype, compression
+
+
+def read_batches(filename):
+    """Read file as arrow record batches, without loading the whole file into memory."""
+    mimetype, compression = import_format(filename)
+    if mimetype == PARQUET:
+        yield from pq.ParquetFile(str(filename)).iter_batches(batch_size=BATCH_SIZE)
+    elif mimetype == ARROW_FILE:
+        reader = pa.ipc.open_file(str(filename))
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
+    elif mimetype == ARROW:
+        yield from pa.ipc.open_stream(str(filename))
+    else:
+        # compressed files are decompressed while reading, not on disk
+        stream = pa.input_stream(str(filename), compression=compression)
+        yield from pa_csv.open_csv(stream,
+                                   read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                                   convert_options=pa_csv.ConvertOptions(column_types=CSV_COLUMN_TYPES))
+
+
+def _cast(field, column):
+    """Convert column to type from `SCHEMA`, only lossless conversions are allowed."""
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    source, target = column.type, field.type
+    if source == target:
+        return column
+    if pa.types.is_string(target) and pa.types.is_large_string(source):
+        return column.cast(target)
+    if pa.types.is_boolean(target) and pa.types.is_integer(source):
+        if not pc.all(pc.is_in(column, value_set=pa.array([0, 1], source))).as_py():
+            raise AssertionError(f'Incorrect value in `{field.name}` column, allowed 0 or 1')
+        return pc.not_equal(column, 0)
+    if is_numeric(target) and is_numeric(source):
+        if field.name in TRUNCATED and pa.types.is_floating(source) and pa.types.is_integer(target):
+            column = pc.trunc(column)
+        try:
+            return column.cast(target)
+        except pa.ArrowInvalid as error:
+            raise AssertionError(f'Incorrect value in `{field.name}` column: {error}')
+    raise AssertionError(f'Incorrect type of `{field.name}` column: {source}')
+
+
+def conform(batch):
+    """Rename columns to api names, check and convert their types, generate missing uuid."""
+    columns = {CSV_NAMES.get(name, name): column for name, column in zip(batch.schema.names, batch.columns)}
+    arrays = []
+    for field in SCHEMA:
+        column = columns.get(field.name)
+        if column is None and field.name == 'uuid':
+            column = pa.array([str(generate_uuid()) for _ in range(batch.num_rows)], pa.string())
+        if column is None:
+            raise AssertionError(f'No `{field.name}` column provided')
+        if column.null_count:
+            raise AssertionError(f'Empty values in `{field.name}` column')
+        arrays.append(_cast(field, column))
+    batch = pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+    if batch.num_rows:
+        if not pc.all(pc.match_substring_regex(batch.column('uuid'), UUID_PATTERN)).as_py():
+            raise AssertionError('Incorrect value in `uuid` column')
+        if not pc.all(pc.is_in(batch.column('sex'), value_set=pa.array([item.value for item in SexEnum]))).as_py():
+            raise AssertionError('Incorrect value in `sex` column')
+        if pc.max(pc.utf8_length(batch.column('name'))).as_py() > 100:
+            raise AssertionError('To long value in `name` column. Max 100 chars.')
+    return batch
+
+
+def _check_new_uuids(batch):
+    """Reject uuids already used, the primary key of partitioned table checks them only within one partition."""
+    used = db.session.execute(text("SELECT uuid FROM person WHERE uuid = ANY(CAST(:uuids AS uuid[])) LIMIT 1"),
+                              {'uuids': batch.column('uuid').to_pylist()}).scalar()
+    if used is not None:
+        raise AssertionError(f'Person with uuid `{used}` already exists')
+
+
+def _save_batch(batch, import_batch=0, check_uuids=False):
+    if check_uuids:
+        _check_new_uuids(batch)
+    rows = pa.RecordBatch.from_arrays(batch.columns, names=COLUMN_NAMES).to_pylist()
+    for row in rows:
+        row['import_batch'] = import_batch
+    db.session.execute(models.Person.__table__.insert(), rows)
+    db.session.bulk_insert_mappings(models.PersonChange, models.PersonChange.from_payloads(batch.to_pylist()))
+
+
+def import_file(filename, progress=_no_progress, import_batch=0, skip=0):
+    """
+    Import people from csv (also gzip or zstd compressed), arrow or parquet file.
+    Every record batch is saved in own transaction, `progress` is called in it right before the commit.
+    People are tagged with `import_batch`, its partition is created when `person` table is partitioned.
+    First `skip` rows (already imported by an interrupted run) are only counted.
+    """
+    partitioned = partitions.is_partitioned()
+    if import_batch and partitioned and not partitions.exists(import_batch):
+        partitions.create(import_batch)
+        db.session.commit()
+    count = 0
+    for batch in read_batches(filename):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            count += batch.num_rows
+            continue
+        count += skip
+        batch, skip = batch.slice(skip), 0
+        batch = conform(batch)
+        _save_batch(batch, import_batch, check_uuids=partitioned)
+        count += batch.num_rows
+        progress(count)
+        db.session.commit()
+    # loaded again on next use, other workers rebuild it when they see the outbox of the import
+    similarity.invalidate()
+    return count
+
+
+def export_csv(filename, progress=_no_progress):
+    """Export all people to csv file (same format as import), reading rows from a server-side cursor."""
+    total = models.Person.query.count()
+    query = models.Person.query.yield_per(BATCH_SIZE)
+    with Path(filename).open('w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file, delimiter=',')
+        csv_writer.writerow(CSV_HEADER)
+        count = 0
+        for person in query:
+            count += 1
+            csv_writer.writerow([
+                int(person.survived), person.passenger_class, person.name, person.sex.value, person.age,
+                person.siblings_or_spouses_aboard, person.parents_or_children_aboard, person.fare])
+            if count % BATCH_SIZE == 0:
+                progress(count, total)
+        progress(count, total)
+    return count
+
+
+def iter_batches(batch_size=BATCH_SIZE):
+    """Read all people as arrow record batches from a server-side cursor."""
+    table = models.Person.__table__
+    columns = [cast(table.c.uuid, String) if name == 'uuid' else
+               cast(table.c.sex, String) if name == 'sex' else
+               table.c[models.Person.to_snake_case(name)]
+               for name in SCHEMA.names]
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(select(columns))
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*rows), SCHEMA)],
+                schema=SCHEMA)
+
+
+class ChunkSink:
+    """Write-only file object which collects written bytes, used to stream files in http response."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def pop(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def open_writer(sink, mimetype):
+    if mimetype == ARROW:
+        return pa.ipc.new_stream(sink, SCHEMA)
+    if mimetype == ARROW_FILE:
+        return pa.ipc.new_file(sink, SCHEMA)
+    if mimetype == PARQUET:
+        return pq.ParquetWriter(sink, SCHEMA)
+    if mimetype == CSV:
+        return pa_csv.CSVWriter(sink, SCHEMA)
+    raise AssertionError(f'Incorrect export format `{mimetype}`')
+
+
+def stream_columnar(mimetype, batch_size=BATCH_SIZE):
+    """Yield exported file in chunks, one chunk per record batch."""
+    sink = ChunkSink()
+    with open_writer(pa.PythonFile(sink, mode='w'), mimetype) as writer:
+        for batch in iter_batches(batch_size):
+            writer.write_batch(batch)
+            yield sink.pop()
+    yield sink.pop()
+
+
+def export_columnar(filename, mimetype, progress=_no_progress):
+    """Export all people to arrow, parquet or csv file written batch by batch."""
+    total = models.Person.query.count()
+    count = 0
+    with open_writer(str(filename), mimetype) as writer:
+        for batch in iter_batches():
+            writer.write_batch(batch)
+            count += batch.num_rows
+            progress(count, total)
+    return count
+
+
+def export_format(filename):
+    """Return format of exported file, chosen by file extension."""
+    mimetype = FORMATS.get(Path(filename).suffix)
+    if mimetype is None:
+        raise AssertionError(f'Incorrect file extension, supported: {", ".join(FORMATS)}')
+    return mimetype
+
+
+def export_file(filename, progress=_no_progress):
+    """Export all people, the format is chosen by file extension."""
+    mimetype = export_format(filename)
+    if mimetype == CSV:
+        return export_csv(filename, progress)
+    return export_columnar(filename, mimetype, progress)
@@ -0,0 +1,124 @@
+"""
+Deadlines of API operations and retries of transient database errors.
+
+Every handler gets a deadline: `REQUEST_TIMEOUT` or `x-deadline` (seconds) of the operation in `swagger.yml`,
+shortened by the client with `X-Request-Timeout` header. Each transaction started by the session during
+the handler gets `statement_timeout` of the remaining time, so a slow query is cancelled by Postgres instead of
+holding the worker. Idempotent operations (and `POST` with `Idempotency-Key`) are run again after serialization
+failures, deadlocks and disconnects, with jittered exponential backoff, as long as the deadline allows it.
+"""
+import time
+import random
+import functools
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from extensions import db
+from models.idempotency import IDEMPOTENCY_HEADER
+
+
+TIMEOUT_HEADER = 'X-Request-Timeout'
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'PATCH', 'DELETE'}
+
+# serialization_failure, deadlock_detected
+RETRYABLE_CODES = {'40001', '40P01'}
+# admin_shutdown, crash_shutdown, cannot_connect_now (failover)
+DISCONNECT_CODES = {'57P01', '57P02', '57P03'}
+# query_canceled (statement_timeout)
+TIMEOUT_CODE = '57014'
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def _pgcode(error):
+    return getattr(error.orig, 'pgcode', None) if isinstance(error, DBAPIError) else None
+
+
+def is_timeout(error):
+    return _pgcode(error) == TIMEOUT_CODE
+
+
+def is_disconnect(error):
+    if not isinstance(error, DBAPIError):
+        return False
+    # connection errors raised by psycopg2 have no SQLSTATE
+    return error.connection_invalidated or _pgcode(error) in DISCONNECT_CODES or \
+        (isinstance(error, OperationalError) and _pgcode(error) is None)
+
+
+def is_retryable(error):
+    return _pgcode(error) in RETRYABLE_CODES or is_disconnect(error)
+
+
+def request_timeout(timeout):
+    """Timeout of current request, client can only shorten it."""
+    value = request.headers.get(TIMEOUT_HEADER)
+    if value is None:
+        return timeout
+    try:
+        client_timeout = float(value)
+    except ValueError:
+        raise AssertionError(f'Incorrect value for `{TIMEOUT_HEADER}`')
+    if client_timeout <= 0:
+        raise AssertionError(f'Incorrect value for `{TIMEOUT_HEADER}`')
+    return min(timeout, client_timeout)
+
+
+def remaining():
+    """Seconds until deadline of current request, None outside of the handler."""
+    if not has_request_context() or g.get('deadline') is None:
+        return None
+    return g.deadline - time.monotonic()
+
+
+def guarded(function, operation):
+    """Run resolved handler with deadline, retry it after transient errors if the operation is idempotent."""
+    # `x-deadline` is a vendor extension, connexion keeps the raw operation only in a private attribute
+    operation_timeout = getattr(operation, '_operation', {}).get('x-deadline')
+    method = operation.method.upper()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        timeout = request_timeout(operation_timeout or config['REQUEST_TIMEOUT'])
+        idempotent = method in IDEMPOTENT_METHODS or IDEMPOTENCY_HEADER in request.headers
+        g.deadline = time.monotonic() + timeout
+        # end transaction opened before the handler (API key lookup of the security check) without
+        # `statement_timeout`, queries of the handler begin a new one which gets it
+        db.session.commit()
+        try:
+            attempt = 1
+            while True:
+                try:
+                    return function(*args, **kwargs)
+                except DBAPIError as error:
+                    if not idempotent or attempt >= config['RETRY_ATTEMPTS'] or not is_retryable(error):
+                        raise
+                    db.session.rollback()
+                    delay = random.uniform(0, config['RETRY_BACKOFF'] * 2 ** (attempt - 1))
+                    if delay >= remaining():
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+        finally:
+            g.deadline = None
+    return wrapper
+
+
+def set_statement_timeout(session, transaction, connection):
+    seconds = remaining()
+    if seconds is None:
+        return
+    if seconds <= 0:
+        raise DeadlineExceeded('Request deadline exceeded')
+    connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"),
+                       timeout=f'{max(int(seconds * 1000), 1)}ms')
+
+
+def init_app(app):
+    if not event.contains(db.session, 'after_begin', set_statement_timeout):
+        event.listen(db.session, 'after_begin', set_statement_timeout)
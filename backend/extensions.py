@@ -3,7 +3,7 @@ import sqlalchemy
 from flask import current_app
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from connexion.resolver import Resolver
+from connexion.resolver import Resolution, Resolver
 
 
 db = SQLAlchemy()
@@ -11,18 +11,22 @@ migrate = Migrate()
 logger = logging.getLogger('alembic')
 
 
-def create_testing_db():
-    """Create DB for testing"""
+def create_testing_db(worker=None):
+    """Create DB for testing, every worker of sharded test run has own DB"""
+    name = f"test_{current_app.config.get('DB_NAME')}"
+    if worker is not None:
+        name = f'{name}_{worker}'
     engine = sqlalchemy.create_engine(current_app.config.get('SQLALCHEMY_DATABASE_URI'))
     conn = engine.connect()
     conn.connection.connection.set_isolation_level(0)
     try:
-        conn.execute(f"CREATE DATABASE test_{current_app.config.get('DB_NAME')}")
-        logger.info(f"Created testing database `test_{current_app.config.get('DB_NAME')}`")
+        conn.execute(f"CREATE DATABASE {name}")
+        logger.info(f"Created testing database `{name}`")
     except sqlalchemy.exc.ProgrammingError:
-        logger.info(f"Database for testing `test_{current_app.config.get('DB_NAME')}` exist.")
+        logger.info(f"Database for testing `{name}` exist.")
     conn.connection.connection.set_isolation_level(1)
     conn.close()
+    return name
 
 
 class PathLocationResolver(Resolver):
@@ -30,6 +34,8 @@ class PathLocationResolver(Resolver):
 
     def __init__(self, *args, **kwargs):
         self.prefix = kwargs.pop('prefix', None)
+        # `decorator(function, operation)` applied to every resolved function, the last one is the outermost
+        self.decorators = kwargs.pop('decorators', [])
         super().__init__(*args, **kwargs)
 
     @staticmethod
@@ -45,3 +51,10 @@ class PathLocationResolver(Resolver):
         if operation.operation_id and self.prefix:
             method = '{}.{}'.format(self.prefix, method)
         return method
+
+    def resolve(self, operation):
+        resolution = super().resolve(operation)
+        function = resolution.function
+        for decorator in self.decorators:
+            function = decorator(function, operation)
+        return Resolution(function, resolution.operation_id)
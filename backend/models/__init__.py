@@ -1 +1,5 @@
 from models.person import Person
+from models.idempotency import IdempotencyKey
+from models.change import PersonChange
+from models.job import Job
+from models.api_key import ApiKey
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import hashlib
+import secrets
+import datetime
+
+from extensions import db
+
+
+API_KEY_HEADER = 'X-API-Key'
+
+
+class ApiKey(db.Model):
+    """API key of a client, only sha256 of the key is stored, the key is shown once when it is created."""
+    key_hash = db.Column(
+        db.String(64),
+        primary_key=True)
+    name = db.Column(
+        db.String(100),
+        nullable=False,
+        unique=True)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow)
+
+    __tablename__ = 'api_key'
+
+    def __repr__(self):
+        return f'<ApiKey {self.name}>'
+
+    def __str__(self):
+        return self.name
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def create(cls, name):
+        """Generate and save a new key, return it together with the stored object."""
+        key = secrets.token_urlsafe(32)
+        obj = cls(key_hash=cls.hash_key(key), name=name)
+        obj.save()
+        return obj, key
+
+    @staticmethod
+    def lookup(key):
+        return ApiKey.query.get(ApiKey.hash_key(key))
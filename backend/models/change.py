@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import enum
+import datetime
+
+from extensions import db
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+
+
+class OperationEnum(enum.Enum):
+    upsert = 'upsert'
+    delete = 'delete'
+
+
+class PersonChange(db.Model):
+    """
+    Outbox of person mutations, written in the same transaction as the change itself.
+
+    Rows are ordered by (txid, sequence) and only rows of transactions older than the
+    oldest transaction still in progress (`txid < visible_before()`) are published, so
+    a consumer never skips a change which commits after it has read a newer one. Changes
+    of the reading transaction itself are not published until it ends either.
+    """
+    sequence = db.Column(
+        db.BigInteger,
+        primary_key=True,
+        autoincrement=True)
+    txid = db.Column(
+        db.BigInteger,
+        nullable=False,
+        server_default=text('txid_current()'))
+    person_uuid = db.Column(
+        UUID(as_uuid=True),
+        nullable=False)
+    operation = db.Column(
+        db.Enum(OperationEnum),
+        nullable=False)
+    payload = db.Column(
+        db.JSON,
+        nullable=True)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow)
+
+    __tablename__ = 'person_change'
+    __table_args__ = (
+        db.Index('ix_person_change_txid_sequence', 'txid', 'sequence'),
+    )
+
+    def __repr__(self):
+        return f'<PersonChange {self.sequence}>'
+
+    def __str__(self):
+        return self.token
+
+    @property
+    def token(self):
+        return self.format_token(self.txid, self.sequence)
+
+    @staticmethod
+    def format_token(txid, sequence):
+        return f'{txid}.{sequence}'
+
+    @staticmethod
+    def parse_token(token):
+        txid, sequence = token.split('.')
+        return int(txid), int(sequence)
+
+    @classmethod
+    def upserted(cls, person):
+        return cls(person_uuid=person.uuid, operation=OperationEnum.upsert, payload=person.dump())
+
+    @classmethod
+    def deleted(cls, person):
+        return cls(person_uuid=person.uuid, operation=OperationEnum.delete, payload=None)
+
+    @staticmethod
+    def from_payloads(payloads):
+        """Rows for `bulk_insert_mappings` from dumped people, used by bulk imports."""
+        return [dict(person_uuid=payload['uuid'], operation=OperationEnum.upsert, payload=payload)
+                for payload in payloads]
+
+    @staticmethod
+    def visible_before():
+        """Oldest transaction still in progress, changes of older transactions are published."""
+        return func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+    @staticmethod
+    def get_since(token, limit):
+        return PersonChange.query \
+            .filter(tuple_(PersonChange.txid, PersonChange.sequence) > tuple_(*PersonChange.parse_token(token))) \
+            .filter(PersonChange.txid < PersonChange.visible_before()) \
+            .order_by(PersonChange.txid, PersonChange.sequence) \
+            .limit(limit) \
+            .all()
+
+    @staticmethod
+    def get_last_token():
+        """Token of the newest published change, consumers which start from it skip all earlier changes."""
+        last = PersonChange.query \
+            .filter(PersonChange.txid < PersonChange.visible_before()) \
+            .order_by(PersonChange.txid.desc(), PersonChange.sequence.desc()) \
+            .first()
+        return last.token if last is not None else '0.0'
+
+    def dump(self):
+        data = {
+            'token': self.token,
+            'uuid': str(self.person_uuid),
+            'operation': self.operation.value,
+        }
+        if self.payload is not None:
+            data['person'] = self.payload
+        return data
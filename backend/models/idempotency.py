@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import hashlib
+import datetime
+
+from extensions import db
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class IdempotencyKey(db.Model):
+    # `sub` of the verified credential, clients choose keys independently and never see responses of others
+    principal = db.Column(
+        db.String(255),
+        primary_key=True)
+    key = db.Column(
+        db.String(255),
+        primary_key=True)
+    request_hash = db.Column(
+        db.String(64),
+        nullable=False)
+    status_code = db.Column(
+        db.SmallInteger,
+        nullable=False)
+    response = db.Column(
+        db.JSON,
+        nullable=True)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        index=True,
+        default=datetime.datetime.utcnow)
+
+    __tablename__ = 'idempotency_key'
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.principal}/{self.key}>'
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def completed(self):
+        return self.response is not None
+
+    def is_expired(self, ttl):
+        return self.created_at + datetime.timedelta(seconds=ttl) < datetime.datetime.utcnow()
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
+    @staticmethod
+    def hash_request(data):
+        payload = json.dumps(data, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def lookup(principal, key, ttl):
+        """Return stored key of the principal (single primary key read), expired keys are removed."""
+        obj = IdempotencyKey.query.get((principal, key))
+        if obj is not None and obj.is_expired(ttl):
+            obj.delete()
+            return None
+        return obj
+
+    @staticmethod
+    def evict(ttl):
+        """Remove all keys older than `ttl` seconds, return number of deleted rows."""
+        deadline = datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)
+        count = IdempotencyKey.query.filter(IdempotencyKey.created_at < deadline).delete()
+        db.session.commit()
+        return count
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import enum
+import datetime
+
+from extensions import db
+from sqlalchemy import and_, or_
+
+
+class JobTypeEnum(enum.Enum):
+    import_data = 'import'
+    export_data = 'export'
+
+
+class JobStatusEnum(enum.Enum):
+    pending = 'pending'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
+class Job(db.Model):
+    id = db.Column(
+        db.BigInteger,
+        primary_key=True,
+        autoincrement=True)
+    type = db.Column(
+        db.Enum(JobTypeEnum, values_callable=lambda enum: [item.value for item in enum]),
+        nullable=False)
+    status = db.Column(
+        db.Enum(JobStatusEnum),
+        nullable=False,
+        default=JobStatusEnum.pending)
+    params = db.Column(
+        db.JSON,
+        nullable=False,
+        default=dict)
+    progress = db.Column(
+        db.BigInteger,
+        nullable=False,
+        default=0)
+    total = db.Column(
+        db.BigInteger,
+        nullable=True)
+    result = db.Column(
+        db.JSON,
+        nullable=True)
+    error = db.Column(
+        db.Text,
+        nullable=True)
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow)
+    # sent by the worker while the job runs, a running job without it for `JOB_TIMEOUT` is claimed again
+    heartbeat_at = db.Column(
+        db.DateTime,
+        nullable=True)
+    attempts = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        server_default='0')
+
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_id', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id}>'
+
+    def __str__(self):
+        return f'{self.type.value} #{self.id}'
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def refresh(self):
+        db.session.refresh(self)
+
+    def report(self, progress, total=None):
+        """Store progress on own connection, running job can keep its transaction (and cursors) open."""
+        now = datetime.datetime.utcnow()
+        values = dict(progress=progress, updated_at=now, heartbeat_at=now)
+        if total is not None:
+            values['total'] = total
+        db.engine.execute(Job.__table__.update().where(Job.__table__.c.id == self.id).values(**values))
+
+    def checkpoint(self, progress):
+        """Set progress in the session, it is committed in one transaction with the work it counts."""
+        self.progress = progress
+        self.heartbeat_at = datetime.datetime.utcnow()
+
+    def finish(self, result):
+        self.status = JobStatusEnum.done
+        self.result = result
+        self.save()
+
+    def fail(self, error):
+        self.status = JobStatusEnum.failed
+        self.error = error
+        self.save()
+
+    @staticmethod
+    def heartbeat(id):
+        """Tell other workers that the job is still running, on own connection like `report`."""
+        db.engine.execute(Job.__table__.update().where(Job.__table__.c.id == id)
+                          .values(heartbeat_at=datetime.datetime.utcnow()))
+
+    @staticmethod
+    def claim(timeout, max_attempts):
+        """
+        Take the oldest pending job or a running one without heartbeat for `timeout` seconds (its worker died),
+        jobs locked by other workers are skipped. A job which was already claimed `max_attempts` times fails.
+        """
+        while True:
+            now = datetime.datetime.utcnow()
+            stale = now - datetime.timedelta(seconds=timeout)
+            job = Job.query \
+                .filter(or_(Job.status == JobStatusEnum.pending,
+                            and_(Job.status == JobStatusEnum.running, Job.heartbeat_at < stale))) \
+                .order_by(Job.id) \
+                .with_for_update(skip_locked=True) \
+                .first()
+            if job is None or job.attempts < max_attempts:
+                break
+            job.status = JobStatusEnum.failed
+            job.error = f'Worker stopped {job.attempts} times while running the job'
+            db.session.commit()
+        if job is not None:
+            job.status = JobStatusEnum.running
+            job.heartbeat_at = now
+            job.attempts += 1
+        db.session.commit()
+        return job
+
+    def dump(self):
+        data = {
+            'id': self.id,
+            'type': self.type.value,
+            'status': self.status.value,
+            'params': self.params,
+            'progress': self.progress,
+            'createdAt': self.created_at.isoformat(),
+            'updatedAt': self.updated_at.isoformat(),
+        }
+        for key in ('total', 'result', 'error'):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        return data
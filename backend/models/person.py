@@ -1,17 +1,29 @@
 #!/usr/bin/env python3
+import os
 import re
 import json
 import enum
+import time
 import string
 import uuid
+import threading
 
 from extensions import db
+from models.change import PersonChange
+from sqlalchemy import bindparam, func, inspect
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import validates
+from sqlalchemy.ext import baked
+from sqlalchemy.orm import load_only, validates
 
 
 SNAKE_CASE = re.compile('((?<=[a-z0-9])[A-Z]|(?!^)[A-Z](?=[a-z]))')
 
+# columns not exposed by api
+PRIVATE_FIELDS = {'import_batch'}
+
+# cache of compiled SQL of hot queries, Query objects are built and compiled only once per cache key
+bakery = baked.bakery()
+
 
 class SexEnum(enum.Enum):
     male = 'male'
@@ -28,8 +40,28 @@ class PersonEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+_uuid_lock = threading.Lock()
+_uuid_last = (0, 0)
+
+
 def generate_uuid():
-    return str(uuid.uuid4())
+    """
+    Time-ordered UUID version 7 (RFC 9562): 48 bits of unix time in ms, 12 bits of sequence within
+    the ms and 62 random bits. New keys are appended at the right edge of the primary key index
+    instead of random pages, uuid4 keys of existing rows stay valid.
+    """
+    global _uuid_last
+    with _uuid_lock:
+        timestamp, sequence = time.time_ns() // 1000000, 0
+        last_timestamp, last_sequence = _uuid_last
+        if timestamp <= last_timestamp:
+            # keep keys generated by the process increasing, also when the clock goes back
+            timestamp, sequence = last_timestamp, last_sequence + 1
+            if sequence > 0xfff:
+                timestamp, sequence = last_timestamp + 1, 0
+        _uuid_last = (timestamp, sequence)
+    random_bits = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=timestamp << 80 | 0x7 << 76 | sequence << 64 | 0b10 << 62 | random_bits)
 
 
 class Person(db.Model):
@@ -64,6 +96,13 @@ class Person(db.Model):
     fare = db.Column(
         db.Float(),
         nullable=False)
+    # ingestion batch, partition key when the table is partitioned (see `partitions.py`)
+    import_batch = db.Column(
+        db.Integer,
+        nullable=False,
+        index=True,
+        default=0,
+        server_default='0')
 
     __tablename__ = 'person'
 
@@ -84,6 +123,15 @@ class Person(db.Model):
         self.parents_or_children_aboard = kwargs.pop('parents_or_children_aboard', None)
         self.fare = kwargs.pop('fare', None)
 
+    @validates('uuid')
+    def validate_uuid(self, key, value):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        try:
+            return uuid.UUID(value)
+        except (TypeError, ValueError, AttributeError):
+            raise AssertionError('Incorrect value for `uuid`')
+
     @validates('passenger_class')
     def validate_passenger_class(self, key, value):
         if value is None:
@@ -142,17 +190,43 @@ class Person(db.Model):
             raise AssertionError('Incorrect type of value for `fare`')
         return value
 
+    def current_value(self, column):
+        """Value of the column as sent by clients (enums by their value)."""
+        value = getattr(self, column)
+        return value.value if isinstance(value, SexEnum) else value
+
     def update(self, **kwargs):
-        for k, v in kwargs.items():
-            if hasattr(self, self.to_snake_case(k)):
-                setattr(self, self.to_snake_case(k), v)
+        """Set fields which differ from current values, return their api names (unknown fields are ignored)."""
+        changed = [name for name, value in kwargs.items()
+                   if name in UPDATABLE_FIELDS and self.current_value(UPDATABLE_FIELDS[name]) != value]
+        for name in changed:
+            setattr(self, UPDATABLE_FIELDS[name], kwargs[name])
+        return changed
 
-    def save(self):
+    def save(self, commit=True):
+        """Write person and its change event, `commit=False` leaves both in the open transaction of the caller."""
+        if self.uuid is not None and inspect(self).transient:
+            self.check_unique_uuid()
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
+        db.session.add(PersonChange.upserted(self))
+        if commit:
+            db.session.commit()
         self.refresh()
 
+    def check_unique_uuid(self):
+        """
+        Reject uuid sent by client which is already used. Primary key of partitioned table is (uuid, import_batch),
+        so the database enforces unique uuid only within a partition. Inserts of the same uuid are serialized by
+        a transaction level advisory lock, the second one sees the row committed by the first one.
+        """
+        key = int.from_bytes(self.uuid.bytes[8:], 'big', signed=True)
+        db.session.execute(func.pg_advisory_xact_lock(key).select())
+        if db.session.query(Person.query.filter(Person.uuid == self.uuid).exists()).scalar():
+            raise AssertionError('Person with this `uuid` already exists')
+
     def delete(self):
+        db.session.add(PersonChange.deleted(self))
         db.session.delete(self)
         db.session.commit()
 
@@ -160,8 +234,40 @@ class Person(db.Model):
         db.session.refresh(self)
 
     @staticmethod
-    def get_all():
-        return Person.query.all()
+    def select(fields=None):
+        """Baked query which loads only columns of given api fields (primary key is always loaded).
+
+        Fields are part of the cache key, SQL is compiled once for each set of fields.
+        """
+        query = bakery(lambda session: session.query(Person))
+        if fields:
+            # arguments of `add_criteria` aren't passed to the step, they only extend the cache key
+            names = tuple(sorted(Person.to_snake_case(name) for name in fields))
+            query.add_criteria(lambda q: q.options(load_only(*names)), names)
+        return query
+
+    @staticmethod
+    def get(uuid, fields=None):
+        """Person with given uuid or None, the identity map is checked before the query."""
+        return Person.select(fields)(db.session()).get(uuid)
+
+    @staticmethod
+    def get_many(uuids, fields=None):
+        """People with given uuids in the same order, missing ones are skipped."""
+        if not uuids:
+            return []
+        query = Person.select(fields)
+        query += lambda q: q.filter(Person.uuid.in_(bindparam('uuids', expanding=True)))
+        people = {person.uuid: person for person in query(db.session()).params(uuids=list(uuids)).all()}
+        return [people[key] for key in uuids if key in people]
+
+    @staticmethod
+    def get_all(import_batch=None, fields=None):
+        query = Person.select(fields)
+        if import_batch is not None:
+            # filter by partition key, only one partition is scanned
+            query += lambda q: q.filter(Person.import_batch == bindparam('import_batch'))
+        return query(db.session()).params(import_batch=import_batch).all()
 
     @staticmethod
     def to_camel_case(snake_str):
@@ -172,12 +278,19 @@ class Person(db.Model):
     def to_snake_case(camel_str):
         return SNAKE_CASE.sub(r'_\1', camel_str).lower()
 
-    def dump(self):
+    def dump(self, fields=None):
         return json.loads(json.dumps(
-            dict([(self.to_camel_case(k), v) for k, v in vars(self).items() if not k.startswith('_')]),
+            dict([(self.to_camel_case(k), v) for k, v in vars(self).items()
+                  if not k.startswith('_') and k not in PRIVATE_FIELDS
+                  and (not fields or self.to_camel_case(k) in fields)]),
             cls=PersonEncoder
         ))
 
     @classmethod
     def load(cls, **kwargs):
         return cls(**dict([(cls.to_snake_case(k), v) for k, v in kwargs.items()]))
+
+
+# api name to column name of fields which can be changed by `Person.update`
+UPDATABLE_FIELDS = {Person.to_camel_case(column.key): column.key for column in Person.__table__.columns
+                    if not column.primary_key and column.key not in PRIVATE_FIELDS}
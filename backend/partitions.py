@@ -0,0 +1,131 @@
+"""
+Optional declarative partitioning of `person` table by `import_batch` (LIST partitions).
+
+The table created by models (and migrations) is a plain table. `convert` turns it into
+a partitioned one, the existing table becomes the partition of batch 0 (people added through
+the API), so its rows are not copied. There is no DEFAULT partition: creating a partition of
+a new batch would have to scan it under an exclusive lock. Every import batch lives in own
+partition which is detached or dropped as a metadata operation instead of a mass DELETE.
+Functions only execute statements in the current session transaction, so they can also be run
+from a migration (`op.get_bind()` session); commit is up to the caller.
+
+Models don't know about partitions, `include_object` hides them from `flask db migrate`, otherwise
+autogenerate would drop the partitions and add UNIQUE (uuid) the partitioned table can't have.
+"""
+import re
+
+from sqlalchemy import text
+
+from extensions import db
+
+
+TABLE = 'person'
+LEGACY_PARTITION = f'{TABLE}_legacy'
+
+
+PARTITION_PATTERN = re.compile(rf'{LEGACY_PARTITION}|{TABLE}_batch_\d+')
+
+
+def partition_name(import_batch):
+    return f'{TABLE}_batch_{int(import_batch)}'
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Filter of alembic autogenerate, skip partitions (attached or detached) with their indexes and
+    the unique constraint of `person.uuid`, which is covered by the primary key of the plain table.
+    """
+    table = object if type_ == 'table' else getattr(object, 'table', None)
+    if table is not None and PARTITION_PATTERN.fullmatch(table.name):
+        return False
+    if type_ == 'unique_constraint' and table.name == TABLE:
+        return [column.name for column in object.columns] != ['uuid']
+    return True
+
+
+def is_partitioned():
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {'table': TABLE}).scalar()
+
+
+def get_all():
+    """Return names of tables attached as partitions of `person`."""
+    return [name for name, in db.session.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:table) ORDER BY 1"
+    ), {'table': TABLE})]
+
+
+def exists(import_batch):
+    return partition_name(import_batch) in get_all()
+
+
+def convert():
+    """
+    Replace plain `person` table with partitioned one, current rows of batch 0 stay in the legacy partition.
+    Rows of other batches (imported before the conversion) are moved to partitions of their batches.
+    """
+    if is_partitioned():
+        raise AssertionError(f'Table `{TABLE}` is already partitioned')
+    db.session.execute(text(f"""
+        ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION};
+        -- replaced by primary key of partitioned table, built while attaching
+        ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT {TABLE}_pkey;
+        ALTER INDEX ix_{TABLE}_import_batch RENAME TO ix_{LEGACY_PARTITION}_import_batch;
+        CREATE TABLE {TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY LIST (import_batch);
+        -- primary key of partitioned table has to contain the partition key
+        ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (uuid, import_batch);
+        CREATE INDEX ix_{TABLE}_import_batch ON {TABLE} (import_batch);
+    """))
+    batches = [batch for batch, in db.session.execute(text(
+        f"SELECT DISTINCT import_batch FROM {LEGACY_PARTITION} WHERE import_batch <> 0 ORDER BY 1"))]
+    for import_batch in batches:
+        create(import_batch)
+        db.session.execute(text(
+            f"INSERT INTO {partition_name(import_batch)} SELECT * FROM {LEGACY_PARTITION} WHERE import_batch = :batch"
+        ), {'batch': import_batch})
+    if batches:
+        db.session.execute(text(f"DELETE FROM {LEGACY_PARTITION} WHERE import_batch <> 0"))
+    db.session.execute(text(f"""
+        -- validated constraint proves the partition bound, so attaching doesn't scan the table again
+        ALTER TABLE {LEGACY_PARTITION} ADD CONSTRAINT {LEGACY_PARTITION}_import_batch_check
+            CHECK (import_batch = 0) NOT VALID;
+        ALTER TABLE {LEGACY_PARTITION} VALIDATE CONSTRAINT {LEGACY_PARTITION}_import_batch_check;
+        ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION} FOR VALUES IN (0);
+    """))
+
+
+def create(import_batch):
+    """Create partition for import batch, only a catalog change (there is no DEFAULT partition to scan)."""
+    if not is_partitioned():
+        raise AssertionError(f'Table `{TABLE}` is not partitioned')
+    db.session.execute(text(
+        f"CREATE TABLE {partition_name(import_batch)} PARTITION OF {TABLE} FOR VALUES IN ({int(import_batch)})"))
+
+
+def _record_deletes(table):
+    """Publish removal of all people from the table in the change outbox, set-based."""
+    db.session.execute(text(f"""
+        INSERT INTO person_change (person_uuid, operation, payload, created_at)
+        SELECT uuid, 'delete', NULL, now() AT TIME ZONE 'utc' FROM {table}
+    """))
+
+
+def detach(import_batch):
+    """Detach partition of import batch, its rows stay in the detached table but leave `person`."""
+    if not exists(import_batch):
+        raise AssertionError(f'No partition for import batch {import_batch}')
+    name = partition_name(import_batch)
+    _record_deletes(name)
+    db.session.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+
+
+def drop(import_batch):
+    """Drop partition of import batch (attached or already detached)."""
+    name = partition_name(import_batch)
+    if exists(import_batch):
+        detach(import_batch)
+    elif db.session.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+        raise AssertionError(f'No partition for import batch {import_batch}')
+    db.session.execute(text(f"DROP TABLE {name}"))
@@ -0,0 +1,216 @@
+"""
+In-memory index of people for similarity search, one per worker process.
+
+Features of every person are rows of a float32 NumPy matrix and `/people/{uuid}/similar` computes distances to all
+rows at once. Distance is euclidean over z-score normalized features: the mean cancels out in a difference, so
+columns are only weighted by 1 / variance computed from running sums, and insert, update and delete never touch
+other rows. A deleted row is replaced by the last one.
+
+The index is loaded on first use. Commits of this worker are applied right after them, before every query the
+index catches up with the `person_change` outbox (changes of other workers and bulk imports). When more than
+`SIMILARITY_REBUILD_THRESHOLD` changes are waiting, e.g. after `import_data`, the index is rebuilt from the table.
+"""
+import uuid
+import threading
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from extensions import db
+from models import Person, PersonChange
+from models.change import OperationEnum
+from models.person import SexEnum
+
+
+FEATURES = ('passenger_class', 'age', 'fare', 'siblings_or_spouses_aboard', 'parents_or_children_aboard', 'sex')
+SEX_VALUES = {SexEnum.male: 0.0, SexEnum.other: 0.5, SexEnum.female: 1.0}
+BATCH_SIZE = 10000
+
+
+def features(passenger_class, age, fare, siblings_or_spouses_aboard, parents_or_children_aboard, sex):
+    return (passenger_class, age, fare, siblings_or_spouses_aboard, parents_or_children_aboard,
+            SEX_VALUES[SexEnum(sex)])
+
+
+def person_features(person):
+    return features(*[getattr(person, name) for name in FEATURES])
+
+
+def payload_features(payload):
+    return features(*[payload[Person.to_camel_case(name)] for name in FEATURES])
+
+
+class SimilarityIndex:
+    """Feature matrix with rows addressed by uuid, safe to use from many threads."""
+
+    def __init__(self, capacity=1024):
+        self.lock = threading.RLock()
+        self.clear(capacity)
+
+    def clear(self, capacity=1024):
+        with self.lock:
+            self.matrix = np.empty((capacity, len(FEATURES)), dtype=np.float32)
+            self.uuids = np.empty(capacity, dtype='V16')
+            self.rows = {}
+            self.sums = np.zeros(len(FEATURES))
+            self.squares = np.zeros(len(FEATURES))
+            # last change of the outbox applied to the index, None if not loaded
+            self.token = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key.bytes in self.rows
+
+    def load(self, uuids, matrix, token):
+        """Replace content of the index, `uuids` are 16 bytes of each uuid."""
+        with self.lock:
+            self.clear(max(len(uuids), 1))
+            self.matrix[:len(uuids)] = matrix
+            self.uuids[:len(uuids)] = uuids
+            self.rows = {key.tobytes(): row for row, key in enumerate(self.uuids[:len(uuids)])}
+            self.sums = self.matrix[:len(uuids)].sum(axis=0, dtype=np.float64)
+            self.squares = np.square(self.matrix[:len(uuids)], dtype=np.float64).sum(axis=0)
+            self.token = token
+
+    def upsert(self, key, values):
+        with self.lock:
+            row = self.rows.get(key.bytes)
+            if row is None:
+                row = len(self.rows)
+                if row == len(self.matrix):
+                    self.matrix = np.resize(self.matrix, (row * 2, len(FEATURES)))
+                    self.uuids = np.resize(self.uuids, row * 2)
+                self.rows[key.bytes] = row
+                self.uuids[row] = key.bytes
+            else:
+                self.sums -= self.matrix[row]
+                self.squares -= np.square(self.matrix[row], dtype=np.float64)
+            self.matrix[row] = values
+            self.sums += self.matrix[row]
+            self.squares += np.square(self.matrix[row], dtype=np.float64)
+
+    def remove(self, key):
+        with self.lock:
+            row = self.rows.pop(key.bytes, None)
+            if row is None:
+                return
+            self.sums -= self.matrix[row]
+            self.squares -= np.square(self.matrix[row], dtype=np.float64)
+            last = len(self.rows)
+            if row != last:
+                self.matrix[row] = self.matrix[last]
+                self.uuids[row] = self.uuids[last]
+                self.rows[self.uuids[row].tobytes()] = row
+
+    def weights(self):
+        """1 / variance of every feature, 0 for constant features."""
+        count = len(self.rows)
+        if count == 0:
+            return np.zeros(len(FEATURES))
+        variance = self.squares / count - np.square(self.sums / count)
+        return np.divide(1.0, variance, out=np.zeros_like(variance), where=variance > 1e-9)
+
+    def nearest(self, values, k, exclude=None):
+        """Uuids and distances of `k` people closest to `values`, nearest first."""
+        with self.lock:
+            count = len(self.rows)
+            # squared in place and float32 weights, no float64 copy of the matrix is made
+            differences = self.matrix[:count] - np.asarray(values, dtype=np.float32)
+            np.square(differences, out=differences)
+            distances = differences @ self.weights().astype(np.float32)
+            excluded = self.rows.get(exclude.bytes) if exclude is not None else None
+            if excluded is not None:
+                distances[excluded] = np.inf
+                count -= 1
+            k = min(k, count)
+            if k <= 0:
+                return []
+            rows = np.argpartition(distances, k - 1)[:k]
+            rows = rows[np.argsort(distances[rows])]
+            return [(uuid.UUID(bytes=self.uuids[row].tobytes()), float(np.sqrt(distances[row]))) for row in rows]
+
+    def apply(self, changes):
+        with self.lock:
+            for change in changes:
+                if change.operation == OperationEnum.delete:
+                    self.remove(change.person_uuid)
+                else:
+                    self.upsert(change.person_uuid, payload_features(change.payload))
+            if changes:
+                self.token = changes[-1].token
+
+    def rebuild(self):
+        """Load all people from the table, changes after the returned outbox token are applied later."""
+        token = PersonChange.get_last_token()
+        table = Person.__table__
+        query = select([table.c.uuid] + [table.c[name] for name in FEATURES])
+        uuids, rows = [], []
+        for row in db.session.execute(query.execution_options(stream_results=True)):
+            uuids.append(row[0].bytes)
+            rows.append(features(*row[1:]))
+        self.load(np.frombuffer(b''.join(uuids), dtype='V16'),
+                  np.array(rows, dtype=np.float32).reshape(-1, len(FEATURES)), token)
+
+    def refresh(self, threshold):
+        """Load the index or catch up with the outbox, rebuild it if too many changes are waiting."""
+        with self.lock:
+            if self.token is not None:
+                changes = PersonChange.get_since(self.token, threshold)
+                if len(changes) < threshold:
+                    self.apply(changes)
+                    return
+            self.rebuild()
+
+
+def get_index():
+    """Index of this worker, up to date with committed changes."""
+    index = current_app.extensions['similarity']
+    index.refresh(current_app.config['SIMILARITY_REBUILD_THRESHOLD'])
+    return index
+
+
+def invalidate():
+    """Drop the index of this worker, it is loaded again on next use."""
+    if has_app_context() and 'similarity' in current_app.extensions:
+        current_app.extensions['similarity'].clear()
+
+
+def collect_changes(session, flush_context):
+    """Remember people written by the flush, they are applied to the index after commit."""
+    pending = session.info.setdefault('similarity', {})
+    for person in session.new | session.dirty:
+        if isinstance(person, Person):
+            pending[person.uuid] = person_features(person)
+    for person in session.deleted:
+        if isinstance(person, Person):
+            pending[person.uuid] = None
+
+
+def apply_changes(session):
+    pending = session.info.pop('similarity', None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions['similarity']
+    with index.lock:
+        if index.token is None:
+            return
+        for key, values in pending.items():
+            if values is None:
+                index.remove(key)
+            else:
+                index.upsert(key, values)
+
+
+def discard_changes(session):
+    session.info.pop('similarity', None)
+
+
+def init_app(app):
+    app.extensions['similarity'] = SimilarityIndex()
+    if not event.contains(db.session, 'after_flush', collect_changes):
+        event.listen(db.session, 'after_flush', collect_changes)
+        event.listen(db.session, 'after_commit', apply_changes)
+        event.listen(db.session, 'after_rollback', discard_changes)
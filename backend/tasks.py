@@ -0,0 +1,97 @@
+import time
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+import dataset
+from extensions import db
+from models.job import Job, JobTypeEnum
+
+
+logger = logging.getLogger(__name__)
+
+
+def data_path(filename):
+    """Resolve file name inside `JOB_DATA_DIR`, jobs can't touch files outside of it."""
+    root = Path(current_app.config['JOB_DATA_DIR']).resolve()
+    path = (root / filename).resolve()
+    if root not in path.parents:
+        raise AssertionError('Incorrect value for `filename`')
+    return path
+
+
+def run_import(job):
+    # progress is committed with each batch, job claimed again after its worker died skips exactly the saved people
+    count = dataset.import_file(data_path(job.params['filename']), progress=job.checkpoint, skip=job.progress)
+    return {'count': count}
+
+
+def run_export(job):
+    filename = job.params.get('filename') or f'export-{job.id}.csv'
+    count = dataset.export_file(data_path(filename), progress=job.report)
+    return {'count': count, 'filename': filename}
+
+
+HANDLERS = {
+    JobTypeEnum.import_data: run_import,
+    JobTypeEnum.export_data: run_export,
+}
+
+
+def heartbeat(app, id, stop):
+    """Send heartbeats of the job until `stop` is set, from own thread (the job can block for long)."""
+    with app.app_context():
+        while not stop.wait(app.config['JOB_HEARTBEAT_INTERVAL']):
+            Job.heartbeat(id)
+
+
+def run(job):
+    logger.info(f'Started job {job}')
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(current_app._get_current_object(), job.id, stop), daemon=True)
+    beat.start()
+    try:
+        result = HANDLERS[job.type](job)
+    except Exception as error:
+        logger.exception(f'Failed job {job}')
+        db.session.rollback()
+        job.fail(str(error))
+    else:
+        logger.info(f'Finished job {job}')
+        job.finish(result)
+    finally:
+        stop.set()
+        beat.join()
+
+
+def run_next():
+    """Claim and run one job, return False if the queue is empty."""
+    config = current_app.config
+    job = Job.claim(config['JOB_TIMEOUT'], config['JOB_MAX_ATTEMPTS'])
+    if job is None:
+        return False
+    run(job)
+    return True
+
+
+def _work(app, interval, burst):
+    with app.app_context():
+        try:
+            while True:
+                if not run_next():
+                    if burst:
+                        return
+                    time.sleep(interval)
+        finally:
+            db.session.remove()
+
+
+def work(app, concurrency=1, interval=1.0, burst=False):
+    """Run at most `concurrency` jobs at the same time, each in own thread and db session."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_work, app, interval, burst) for _ in range(concurrency)]
+        for future in futures:
+            future.result()
@@ -0,0 +1,69 @@
+import flask_testing
+from unittest import mock
+from sqlalchemy import event, func
+
+from app import create_app
+from extensions import db
+from models import PersonChange
+
+
+_app = None
+
+
+def get_app():
+    """Create testing app and database schema once per process."""
+    global _app
+    if _app is None:
+        _app = create_app(config_name="testing").app
+        with _app.app_context():
+            db.drop_all()
+            db.create_all()
+    return _app
+
+
+def restart_savepoint(session, transaction):
+    if transaction.nested and not transaction._parent.nested:
+        session.expire_all()
+        session.begin_nested()
+
+
+class DatabaseTestCase(flask_testing.TestCase):
+    """
+    Test case which shares one app and database schema with all tests in the process.
+
+    Every test runs in one transaction rolled back in `tearDown`. The session works inside
+    a SAVEPOINT, so `commit` and `rollback` called by the app never end that transaction.
+    """
+
+    # `PersonChange.visible_before` of the app, tests of the visibility itself patch it back
+    visible_before = PersonChange.__dict__['visible_before']
+
+    def create_app(self):
+        return get_app()
+
+    def setUp(self):
+        self.connection = db.get_engine(self.app).connect()
+        self.connection.begin()
+        # everything which asks for an engine (session, `db.engine.execute`) uses this connection
+        db.get_engine = lambda *args, **kwargs: self.connection
+        db.session.remove()
+        self.session = db.session()
+        self.session.begin_nested()
+        event.listen(self.session, 'after_transaction_end', restart_savepoint)
+        # the similarity index would keep people of rolled back tests
+        self.app.extensions['similarity'].clear()
+        # the whole test is one transaction, which never ends while the change feed is read,
+        # its changes are published as if every `commit` of the app ended a transaction
+        self.visibility = mock.patch.object(PersonChange, 'visible_before',
+                                            staticmethod(lambda: func.txid_current() + 1))
+        self.visibility.start()
+        self.addCleanup(self.visibility.stop)
+        # every request is authenticated with the key from `TestingConfig.API_KEYS`
+        self.client.environ_base['HTTP_X_API_KEY'] = self.app.config['API_KEYS'][0]
+
+    def tearDown(self):
+        event.remove(self.session, 'after_transaction_end', restart_savepoint)
+        db.session.remove()
+        del db.get_engine
+        # closing the connection rolls back its transaction
+        self.connection.close()
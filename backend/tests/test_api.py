@@ -1,14 +1,21 @@
 import json
+import time
 import uuid
+import datetime
+import tempfile
 import unittest
-import flask_testing
+import pyarrow as pa
+import pyarrow.parquet as pq
+from unittest import mock
+from sqlalchemy import event
 
-from app import create_app
-from extensions import db
+from tests.base import DatabaseTestCase
 import models
+import tasks
+from models.job import JobStatusEnum, JobTypeEnum
 
 
-class ApiTests(flask_testing.TestCase):
+class ApiTests(DatabaseTestCase):
     response_error = {
         'detail': None,
         'status': 400,
@@ -21,10 +28,6 @@ class ApiTests(flask_testing.TestCase):
         'title': 'Bad Request',
         'type': 'about:blank'}
 
-    def create_app(self):
-        application = create_app(config_name="testing")
-        return application.app
-
     def setUp(self):
         """Define test variables and initialize app."""
         self.person = dict(
@@ -38,15 +41,7 @@ class ApiTests(flask_testing.TestCase):
             siblingsOrSpousesAboard=0,
             parentsOrChildrenAboard=0
         )
-
-        with self.app.app_context():
-            db.create_all()
-
-    def tearDown(self):
-        """teardown all initialized variables."""
-        with self.app.app_context():
-            db.session.remove()
-            db.drop_all()
+        super().setUp()
 
     # default page
     def test_get_default_http_response(self):
@@ -196,6 +191,39 @@ class ApiTests(flask_testing.TestCase):
         self.assert400(response)
         self.assertDictContainsSubset(response.json, self.connexion_error)
 
+    def test_add_new_person_with_idempotency_key(self):
+        person = self.person.copy()
+        del person['uuid']
+        headers = {'Idempotency-Key': 'add-person-1'}
+        response1 = self.client.post("/people", data=json.dumps(person), headers=headers, content_type='application/json')
+        response2 = self.client.post("/people", data=json.dumps(person), headers=headers, content_type='application/json')
+        self.assert200(response1)
+        self.assert200(response2)
+        self.assertEqual(response1.json, response2.json)
+        self.assertEqual(models.Person.query.count(), 1)
+
+    def test_add_new_person_with_reused_idempotency_key(self):
+        person = self.person.copy()
+        del person['uuid']
+        headers = {'Idempotency-Key': 'add-person-1'}
+        self.client.post("/people", data=json.dumps(person), headers=headers, content_type='application/json')
+        person['name'] = 'Alex'
+        response = self.client.post("/people", data=json.dumps(person), headers=headers, content_type='application/json')
+        self.assertStatus(response, 409)
+        self.assertEqual(models.Person.query.count(), 1)
+
+    def test_add_new_person_with_idempotency_key_of_other_client(self):
+        person = self.person.copy()
+        del person['uuid']
+        headers = {'Idempotency-Key': 'add-person-1'}
+        response1 = self.client.post("/people", data=json.dumps(person), headers=headers, content_type='application/json')
+        obj, key = models.ApiKey.create('client')
+        response2 = self.client.post("/people", data=json.dumps(person), headers=dict(headers, **{'X-API-Key': key}),
+                                     content_type='application/json')
+        self.assert200(response2)
+        self.assertNotEqual(response1.json['uuid'], response2.json['uuid'])
+        self.assertEqual(models.Person.query.count(), 2)
+
     # list person
     def test_list_people(self):
         response = self.client.get("/people", content_type='application/json')
@@ -208,6 +236,79 @@ class ApiTests(flask_testing.TestCase):
         self.assertEqual(len(response.json), 1)
         self.assertDictContainsSubset(response.json[0], self.person)
 
+    def test_list_people_by_batch(self):
+        models.Person.load(**self.person).save()
+        response = self.client.get("/people?batch=0", content_type='application/json')
+        self.assertEqual(len(response.json), 1)
+        response = self.client.get("/people?batch=1", content_type='application/json')
+        self.assertEqual(response.json, [])
+
+    def test_list_people_fields(self):
+        models.Person.load(**self.person).save()
+        response = self.client.get("/people?fields=uuid,name,survived", content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(response.json, [dict(uuid=self.person['uuid'], name='John Badduch', survived=True)])
+
+    def test_list_people_incorrect_fields(self):
+        response = self.client.get("/people?fields=name,password", content_type='application/json')
+        self.assert400(response)
+
+    # export people
+    def test_export_people_arrow(self):
+        models.Person.load(**self.person).save()
+        response = self.client.get("/people/export", headers={'Accept': 'application/vnd.apache.arrow.stream'})
+        self.assert200(response)
+        self.assertEqual(response.mimetype, 'application/vnd.apache.arrow.stream')
+        table = pa.ipc.open_stream(response.data).read_all()
+        self.assertEqual(table.to_pylist(), [self.person])
+
+    def test_export_people_parquet(self):
+        models.Person.load(**self.person).save()
+        response = self.client.get("/people/export", headers={'Accept': 'application/vnd.apache.parquet'})
+        self.assert200(response)
+        table = pq.read_table(pa.BufferReader(response.data))
+        self.assertEqual(table.to_pylist(), [self.person])
+
+    def test_export_people_csv(self):
+        models.Person.load(**self.person).save()
+        response = self.client.get("/people/export", headers={'Accept': 'text/csv'})
+        self.assert200(response)
+        self.assertEqual(len(response.data.decode().splitlines()), 2)
+
+    def test_export_people_unsupported_format(self):
+        response = self.client.get("/people/export", headers={'Accept': 'application/xml'})
+        self.assertStatus(response, 406)
+
+    # list changes
+    def test_list_changes(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        obj.delete()
+        response = self.client.get("/people/changes", content_type='application/json')
+        self.assert200(response)
+        self.assertEqual([item['operation'] for item in response.json['changes']], ['upsert', 'delete'])
+        self.assertDictContainsSubset(response.json['changes'][0]['person'], self.person)
+        self.assertEqual(response.json['next'], response.json['changes'][-1]['token'])
+
+    def test_list_changes_since_token(self):
+        models.Person.load(**self.person).save()
+        token = self.client.get("/people/changes", content_type='application/json').json['next']
+        response = self.client.get(f"/people/changes?since={token}", content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(response.json, {'changes': [], 'next': token})
+
+    def test_list_changes_of_transaction_in_progress(self):
+        models.Person.load(**self.person).save()
+        # transaction of the test is still in progress, even its own reader doesn't get a token after its events
+        with mock.patch.object(models.PersonChange, 'visible_before', self.visible_before):
+            response = self.client.get("/people/changes", content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(response.json, {'changes': [], 'next': '0.0'})
+
+    def test_list_changes_with_incorrect_token(self):
+        response = self.client.get("/people/changes?since=abc", content_type='application/json')
+        self.assert400(response)
+
     # get person
     def test_get_person(self):
         obj = models.Person.load(**self.person)
@@ -216,6 +317,13 @@ class ApiTests(flask_testing.TestCase):
         self.assert200(response)
         self.assertDictContainsSubset(response.json, obj.dump())
 
+    def test_get_person_fields(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        response = self.client.get(f"/people/{str(obj.uuid)}?fields=age", content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(response.json, dict(age=40))
+
     def test_get_incorrect_person(self):
         models.Person.load(**self.person).save()
         response = self.client.get(f"/people/{uuid.uuid4()}", content_type='application/json')
@@ -231,6 +339,15 @@ class ApiTests(flask_testing.TestCase):
         obj.refresh()
         self.assertDictContainsSubset(response.json, obj.dump())
 
+    def test_update_person_without_changes(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        response = self.client.put(f"/people/{obj.uuid}", data=json.dumps({'name': 'John Badduch', 'sex': 'male'}),
+                                   content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(response.json, self.person)
+        self.assertEqual(models.PersonChange.query.count(), 1)
+
     def test_update_incorrect_person(self):
         models.Person.load(**self.person).save()
         response = self.client.get(f"/people/{uuid.uuid4()}", content_type='application/json')
@@ -243,6 +360,44 @@ class ApiTests(flask_testing.TestCase):
         self.assert200(response)
         self.assertDictContainsSubset(response.json, obj.dump())
 
+    # patch person
+    def test_patch_person(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        statements = []
+        event.listen(self.connection, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        response = self.client.patch(f"/people/{obj.uuid}", data=json.dumps({'age': 41, 'name': 'John Badduch'}),
+                                     content_type='application/merge-patch+json')
+        self.assert200(response)
+        self.assertEqual(response.json, dict(self.person, age=41))
+        updates = [statement for statement in statements if statement.startswith('UPDATE person ')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET age=', updates[0])
+        self.assertNotIn('name=', updates[0])
+        self.assertEqual(models.PersonChange.query.count(), 2)
+
+    def test_patch_person_without_changes(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        response = self.client.patch(f"/people/{obj.uuid}", data=json.dumps({'age': 40}),
+                                     content_type='application/merge-patch+json')
+        self.assert200(response)
+        self.assertEqual(response.json, self.person)
+        self.assertEqual(models.PersonChange.query.count(), 1)
+
+    def test_patch_person_with_null(self):
+        obj = models.Person.load(**self.person)
+        obj.save()
+        response = self.client.patch(f"/people/{obj.uuid}", data=json.dumps({'age': None}),
+                                     content_type='application/merge-patch+json')
+        self.assert400(response)
+
+    def test_patch_incorrect_person(self):
+        response = self.client.patch(f"/people/{uuid.uuid4()}", data=json.dumps({'age': 40}),
+                                     content_type='application/merge-patch+json')
+        self.assert404(response)
+
     # delete person
     def test_delete_person(self):
         obj = models.Person.load(**self.person)
@@ -255,6 +410,96 @@ class ApiTests(flask_testing.TestCase):
         response = self.client.get(f"/people/{str(uuid.uuid4())}", content_type='application/json')
         self.assert404(response)
 
+    # jobs
+    def test_add_export_job(self):
+        response = self.client.post("/jobs", data=json.dumps({'type': 'export'}), content_type='application/json')
+        self.assertStatus(response, 202)
+        self.assertEqual(response.json['status'], 'pending')
+        self.assertEqual(response.json['progress'], 0)
+
+    def test_add_import_job_without_filename(self):
+        self.response_error['detail'] = 'No `filename` provided'
+        response = self.client.post("/jobs", data=json.dumps({'type': 'import'}), content_type='application/json')
+        self.assert400(response)
+        self.assertDictContainsSubset(response.json, self.response_error)
+
+    def test_add_import_job_with_filename_outside_data_dir(self):
+        self.response_error['detail'] = 'Incorrect value for `filename`'
+        job = {'type': 'import', 'filename': '../../etc/passwd'}
+        response = self.client.post("/jobs", data=json.dumps(job), content_type='application/json')
+        self.assert400(response)
+        self.assertDictContainsSubset(response.json, self.response_error)
+
+    def test_run_export_and_import_job(self):
+        models.Person.load(**self.person).save()
+        with tempfile.TemporaryDirectory() as data_dir:
+            self.addCleanup(self.app.config.__setitem__, 'JOB_DATA_DIR', self.app.config['JOB_DATA_DIR'])
+            self.app.config['JOB_DATA_DIR'] = data_dir
+            job_id = self.client.post("/jobs", data=json.dumps({'type': 'export', 'filename': 'people.csv'}),
+                                      content_type='application/json').json['id']
+            self.assertTrue(tasks.run_next())
+            response = self.client.get(f"/jobs/{job_id}", content_type='application/json')
+            self.assert200(response)
+            self.assertEqual(response.json['status'], 'done')
+            self.assertEqual(response.json['result'], {'count': 1, 'filename': 'people.csv'})
+
+            job_id = self.client.post("/jobs", data=json.dumps({'type': 'import', 'filename': 'people.csv'}),
+                                      content_type='application/json').json['id']
+            self.assertTrue(tasks.run_next())
+            self.assertFalse(tasks.run_next())
+            response = self.client.get(f"/jobs/{job_id}", content_type='application/json')
+            self.assertEqual(response.json['status'], 'done')
+            self.assertEqual(response.json['progress'], 1)
+            self.assertEqual(models.Person.query.count(), 2)
+
+    def add_running_job(self, heartbeat_age, attempts=1, **kwargs):
+        heartbeat_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=heartbeat_age)
+        job = models.Job(status=JobStatusEnum.running, heartbeat_at=heartbeat_at, attempts=attempts, **kwargs)
+        job.save()
+        return job
+
+    def test_reclaim_job_of_dead_worker(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            self.addCleanup(self.app.config.__setitem__, 'JOB_DATA_DIR', self.app.config['JOB_DATA_DIR'])
+            self.app.config['JOB_DATA_DIR'] = data_dir
+            with open(f'{data_dir}/people.csv', 'w') as csv_file:
+                csv_file.write('Survived,Pclass,Name,Sex,Age,Siblings/Spouses Aboard,Parents/Children Aboard,Fare\n'
+                               '0,3,Mr. Owen Harris Braund,male,22,1,0,7.25\n'
+                               '1,1,Master. Alden Gates Caldwell,male,0.83,0,2,29\n')
+            # the first person was imported before the worker died
+            job = self.add_running_job(self.app.config['JOB_TIMEOUT'] + 1, type=JobTypeEnum.import_data,
+                                       params={'filename': 'people.csv'}, progress=1)
+            self.assertTrue(tasks.run_next())
+        job = models.Job.query.get(job.id)
+        self.assertEqual(job.status, JobStatusEnum.done)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.progress, 2)
+        self.assertEqual([person.name for person in models.Person.get_all()], ['Master. Alden Gates Caldwell'])
+
+    def test_running_job_with_heartbeat_is_not_claimed(self):
+        self.add_running_job(1, type=JobTypeEnum.export_data)
+        self.assertFalse(tasks.run_next())
+
+    def test_heartbeat_of_running_job(self):
+        job = models.Job(type=JobTypeEnum.export_data)
+        job.save()
+        with mock.patch.dict(self.app.config, JOB_HEARTBEAT_INTERVAL=0.01), \
+                mock.patch.dict(tasks.HANDLERS, {JobTypeEnum.export_data: lambda job: time.sleep(0.1) or {}}), \
+                mock.patch.object(models.Job, 'heartbeat') as heartbeat:
+            self.assertTrue(tasks.run_next())
+        heartbeat.assert_called_with(job.id)
+
+    def test_fail_job_after_max_attempts(self):
+        job = self.add_running_job(self.app.config['JOB_TIMEOUT'] + 1, attempts=self.app.config['JOB_MAX_ATTEMPTS'],
+                                   type=JobTypeEnum.export_data)
+        self.assertFalse(tasks.run_next())
+        job = models.Job.query.get(job.id)
+        self.assertEqual(job.status, JobStatusEnum.failed)
+
+    def test_get_incorrect_job(self):
+        response = self.client.get("/jobs/1", content_type='application/json')
+        self.assert404(response)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+import json
+import time
+import tempfile
+import unittest
+from pathlib import Path
+
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import auth
+from tests.base import DatabaseTestCase
+from models import ApiKey
+
+
+class TTLCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = auth.TTLCache(maxsize=2, ttl=10, timer=lambda: self.now)
+
+    def test_get_before_expiration(self):
+        self.cache.set('a', 1)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_get_after_expiration(self):
+        self.cache.set('a', 1)
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_shorter_ttl(self):
+        self.cache.set('a', 1, ttl=2)
+        self.now = 2
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_evict_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+
+
+class AuthTests(DatabaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.folder = tempfile.TemporaryDirectory()
+        jwk = json.loads(RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        jwks_file = Path(self.folder.name) / 'jwks.json'
+        jwks_file.write_text(json.dumps({'keys': [dict(jwk, kid='test', alg='RS256', use='sig')]}))
+        super().setUp()
+        del self.client.environ_base['HTTP_X_API_KEY']
+        authenticator = self.app.extensions['auth']
+        self.addCleanup(self.app.extensions.__setitem__, 'auth', authenticator)
+        self.app.config['JWKS_FILE'] = str(jwks_file)
+        self.addCleanup(self.app.config.__setitem__, 'JWKS_FILE', None)
+        auth.init_app(self.app)
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        self.folder.cleanup()
+        super().tearDown()
+
+    def token(self, **claims):
+        claims = dict(dict(sub='client', exp=int(time.time()) + 60), **claims)
+        return jwt.encode(claims, self.private_key, algorithm='RS256', headers={'kid': 'test'})
+
+    def test_without_credentials(self):
+        response = self.client.get("/people")
+        self.assert401(response)
+
+    def test_config_api_key(self):
+        response = self.client.get("/people", headers={'X-API-Key': 'testing'})
+        self.assert200(response)
+
+    def test_incorrect_api_key(self):
+        response = self.client.get("/people", headers={'X-API-Key': 'incorrect'})
+        self.assert401(response)
+        self.assertEqual(len(self.app.extensions['auth'].cache), 0)
+
+    def test_db_api_key_is_cached(self):
+        obj, key = ApiKey.create('client')
+        self.assertNotEqual(obj.key_hash, key)
+        self.assert200(self.client.get("/people", headers={'X-API-Key': key}))
+        obj.delete()
+        # verified key is not looked up again until it expires in cache
+        self.assert200(self.client.get("/people", headers={'X-API-Key': key}))
+        self.app.extensions['auth'].cache.clear()
+        self.assert401(self.client.get("/people", headers={'X-API-Key': key}))
+
+    def test_bearer_token(self):
+        response = self.client.get("/people", headers={'Authorization': f'Bearer {self.token()}'})
+        self.assert200(response)
+        self.assertEqual(len(self.app.extensions['auth'].cache), 1)
+
+    def test_expired_bearer_token(self):
+        token = self.token(exp=int(time.time()) - 1)
+        self.assert401(self.client.get("/people", headers={'Authorization': f'Bearer {token}'}))
+
+    def test_bearer_token_signed_by_other_key(self):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        token = jwt.encode({'sub': 'client', 'exp': int(time.time()) + 60}, other_key,
+                           algorithm='RS256', headers={'kid': 'test'})
+        self.assert401(self.client.get("/people", headers={'Authorization': f'Bearer {token}'}))
+
+    def test_bearer_token_with_unknown_key_id(self):
+        token = jwt.encode({'sub': 'client', 'exp': int(time.time()) + 60}, self.private_key,
+                           algorithm='RS256', headers={'kid': 'other'})
+        self.assert401(self.client.get("/people", headers={'Authorization': f'Bearer {token}'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import dataset
+from tests.base import DatabaseTestCase
+from extensions import db
+from models import Person, PersonChange
+
+
+class DatasetTests(DatabaseTestCase):
+    csv_data = (
+        'Survived,Pclass,Name,Sex,Age,Siblings/Spouses Aboard,Parents/Children Aboard,Fare\n'
+        '0,3,Mr. Owen Harris Braund,male,22,1,0,7.25\n'
+        '1,1,Master. Alden Gates Caldwell,male,0.83,0,2,29\n'
+    )
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = Path(self.folder.name)
+        self.person = dict(
+            uuid='4ac063d5-efc3-4d30-aa99-b7e5fe33b845',
+            age=40,
+            sex='male',
+            fare=7.25,
+            name='John Badduch',
+            survived=True,
+            passengerClass=3,
+            siblingsOrSpousesAboard=0,
+            parentsOrChildrenAboard=0
+        )
+        super().setUp()
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_import_format(self):
+        self.assertEqual(dataset.import_format('people.csv'), (dataset.CSV, None))
+        self.assertEqual(dataset.import_format('people.csv.gz'), (dataset.CSV, 'gzip'))
+        self.assertEqual(dataset.import_format('people.csv.zst'), (dataset.CSV, 'zstd'))
+        self.assertEqual(dataset.import_format('people.parquet'), (dataset.PARQUET, None))
+        self.assertEqual(dataset.import_format('people.arrow'), (dataset.ARROW_FILE, None))
+
+    def test_import_format_incorrect_extension(self):
+        for filename in ('people', 'people.txt', 'people.parquet.gz'):
+            with self.assertRaises(AssertionError):
+                dataset.import_format(filename)
+
+    def test_import_csv(self):
+        (self.path / 'people.csv').write_text(self.csv_data)
+        self.assertEqual(dataset.import_file(self.path / 'people.csv'), 2)
+        people = {person.name: person for person in Person.get_all()}
+        self.assertFalse(people['Mr. Owen Harris Braund'].survived)
+        self.assertTrue(people['Master. Alden Gates Caldwell'].survived)
+        self.assertEqual(people['Master. Alden Gates Caldwell'].age, 0)
+        self.assertEqual(people['Master. Alden Gates Caldwell'].fare, 29.0)
+        self.assertEqual(PersonChange.query.count(), 2)
+
+    def test_import_compressed_csv(self):
+        with gzip.open(self.path / 'people.csv.gz', 'wt') as csv_file:
+            csv_file.write(self.csv_data)
+        self.assertEqual(dataset.import_file(self.path / 'people.csv.gz'), 2)
+        self.assertEqual(Person.query.count(), 2)
+
+    def test_import_zstd_compressed_csv(self):
+        with pa.output_stream(str(self.path / 'people.csv.zst'), compression='zstd') as stream:
+            stream.write(self.csv_data.encode())
+        self.assertEqual(dataset.import_file(self.path / 'people.csv.zst'), 2)
+        self.assertEqual(Person.query.count(), 2)
+
+    def test_import_parquet(self):
+        pq.write_table(pa.Table.from_pylist([self.person], schema=dataset.SCHEMA), self.path / 'people.parquet')
+        self.assertEqual(dataset.import_file(self.path / 'people.parquet'), 1)
+        self.assertDictContainsSubset(Person.query.one().dump(), self.person)
+
+    def test_import_exported_arrow(self):
+        Person.load(**self.person).save()
+        dataset.export_file(self.path / 'people.arrow')
+        db.session.query(Person).delete()
+        self.assertEqual(dataset.import_file(self.path / 'people.arrow'), 1)
+        self.assertDictContainsSubset(Person.query.one().dump(), self.person)
+
+    def test_conform_casts_compatible_types(self):
+        person = dict(self.person, survived=1, passengerClass=3.0)
+        del person['uuid']
+        batch = dataset.conform(pa.RecordBatch.from_pylist([person]))
+        self.assertEqual(batch.schema, dataset.SCHEMA)
+        self.assertTrue(batch.column('survived')[0].as_py())
+        self.assertEqual(len(batch.column('uuid')[0].as_py()), 36)
+
+    def test_conform_without_column(self):
+        person = self.person.copy()
+        del person['name']
+        with self.assertRaises(AssertionError):
+            dataset.conform(pa.RecordBatch.from_pylist([person]))
+
+    def test_conform_incorrect_type(self):
+        with self.assertRaises(AssertionError):
+            dataset.conform(pa.RecordBatch.from_pylist([dict(self.person, age='40')]))
+
+    def test_conform_fractional_integer(self):
+        with self.assertRaises(AssertionError):
+            dataset.conform(pa.RecordBatch.from_pylist([dict(self.person, passengerClass=2.5)]))
+
+    def test_conform_incorrect_sex(self):
+        with self.assertRaises(AssertionError):
+            dataset.conform(pa.RecordBatch.from_pylist([dict(self.person, sex='unknown')]))
+
+    def test_conform_incorrect_uuid(self):
+        with self.assertRaises(AssertionError):
+            dataset.conform(pa.RecordBatch.from_pylist([dict(self.person, uuid='4ac063d5-efc3-4d30-aa99')]))
+
+    def test_import_parquet_with_incorrect_uuid(self):
+        people = [self.person, dict(self.person, uuid='not-a-uuid')]
+        pq.write_table(pa.Table.from_pylist(people, schema=dataset.SCHEMA), self.path / 'people.parquet')
+        with self.assertRaises(AssertionError):
+            dataset.import_file(self.path / 'people.parquet')
+        self.assertEqual(Person.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+from flask import g
+from sqlalchemy.exc import OperationalError
+
+import deadlines
+from tests.base import DatabaseTestCase
+from extensions import db
+from models import ApiKey, Person, IdempotencyKey
+
+
+class DatabaseError(Exception):
+    """Stands for psycopg2 error, which has SQLSTATE in `pgcode`."""
+
+    def __init__(self, pgcode):
+        super().__init__(f'error {pgcode}')
+        self.pgcode = pgcode
+
+
+def database_error(pgcode, invalidated=False):
+    return OperationalError('SELECT 1', {}, DatabaseError(pgcode), connection_invalidated=invalidated)
+
+
+class DeadlinesTests(DatabaseTestCase):
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.person = dict(
+            age=40,
+            sex='male',
+            fare=7.25,
+            name='John Badduch',
+            survived=True,
+            passengerClass=3,
+            siblingsOrSpousesAboard=0,
+            parentsOrChildrenAboard=0
+        )
+        super().setUp()
+
+    def test_error_classification(self):
+        self.assertTrue(deadlines.is_timeout(database_error('57014')))
+        self.assertTrue(deadlines.is_retryable(database_error('40001')))
+        self.assertTrue(deadlines.is_retryable(database_error('40P01')))
+        self.assertTrue(deadlines.is_disconnect(database_error(None, invalidated=True)))
+        self.assertTrue(deadlines.is_disconnect(database_error('57P01')))
+        self.assertFalse(deadlines.is_retryable(database_error('23505')))
+
+    def test_statement_timeout(self):
+        with self.app.test_request_context():
+            g.deadline = time.monotonic() + 0.05
+            deadlines.set_statement_timeout(db.session, None, self.connection)
+            with self.assertRaises(OperationalError) as context:
+                self.connection.execute('SELECT pg_sleep(1)')
+        self.assertTrue(deadlines.is_timeout(context.exception))
+
+    def test_statement_timeout_after_deadline(self):
+        with self.app.test_request_context():
+            g.deadline = time.monotonic() - 1
+            with self.assertRaises(deadlines.DeadlineExceeded):
+                deadlines.set_statement_timeout(db.session, None, self.connection)
+
+    def test_statement_timeout_after_api_key_lookup(self):
+        api_key, key = ApiKey.create('deadline')
+        self.app.extensions['auth'].cache.clear()
+        # the security check reads the key from DB before the handler, in the same session
+        response = self.client.get("/people", headers={'X-API-Key': key, 'X-Request-Timeout': '0.000001'})
+        self.assertStatus(response, 504)
+
+    def test_request_timeout_header(self):
+        with self.app.test_request_context(headers={'X-Request-Timeout': '2.5'}):
+            self.assertEqual(deadlines.request_timeout(30), 2.5)
+            self.assertEqual(deadlines.request_timeout(1), 1)
+
+    def test_incorrect_request_timeout_header(self):
+        response = self.client.get("/people", headers={'X-Request-Timeout': 'soon'})
+        self.assert400(response)
+
+    def test_retry_idempotent_operation(self):
+        with mock.patch.object(Person, 'get_all', side_effect=[database_error('40001'), []]) as get_all:
+            response = self.client.get("/people")
+        self.assert200(response)
+        self.assertEqual(get_all.call_count, 2)
+
+    def test_retry_post_with_idempotency_key(self):
+        save = Person.save
+        errors = [database_error('40P01')]
+
+        def fail_once(obj, **kwargs):
+            if errors:
+                raise errors.pop()
+            save(obj, **kwargs)
+
+        with mock.patch.object(Person, 'save', fail_once):
+            response = self.client.post("/people", data=json.dumps(self.person), content_type='application/json',
+                                        headers={'Idempotency-Key': 'retry'})
+        self.assert200(response)
+        self.assertEqual(Person.query.count(), 1)
+
+    def test_retry_post_after_failed_commit_of_idempotency_key(self):
+        save = IdempotencyKey.save
+        errors = [database_error(None, invalidated=True)]
+
+        def fail_once(obj):
+            if errors:
+                raise errors.pop()
+            save(obj)
+
+        headers = {'Idempotency-Key': 'commit'}
+        with mock.patch.object(IdempotencyKey, 'save', fail_once):
+            response = self.client.post("/people", data=json.dumps(self.person), content_type='application/json',
+                                        headers=headers)
+        self.assert200(response)
+        self.assertEqual(Person.query.count(), 1)
+        replay = self.client.post("/people", data=json.dumps(self.person), content_type='application/json',
+                                  headers=headers)
+        self.assert200(replay)
+        self.assertEqual(replay.json, response.json)
+        self.assertEqual(Person.query.count(), 1)
+
+    def test_no_retry_post_without_idempotency_key(self):
+        with mock.patch.object(Person, 'save', side_effect=database_error('40001')) as save:
+            response = self.client.post("/people", data=json.dumps(self.person), content_type='application/json')
+        self.assert500(response)
+        self.assertEqual(save.call_count, 1)
+
+    def test_disconnect_after_retries(self):
+        error = database_error(None, invalidated=True)
+        with mock.patch.object(Person, 'get_all', side_effect=error) as get_all:
+            response = self.client.get("/people")
+        self.assertStatus(response, 503)
+        self.assertEqual(response.json['type'], 'orm')
+        self.assertEqual(get_all.call_count, self.app.config['RETRY_ATTEMPTS'])
+
+    def test_statement_timeout_response(self):
+        with mock.patch.object(Person, 'get_all', side_effect=database_error('57014')):
+            response = self.client.get("/people")
+        self.assertStatus(response, 504)
+        self.assertEqual(response.json['title'], 'Gateway Timeout')
+
+    def test_deadline_exceeded_response(self):
+        with mock.patch.object(Person, 'get_all', side_effect=deadlines.DeadlineExceeded('Request deadline exceeded')):
+            response = self.client.get("/people")
+        self.assertStatus(response, 504)
+        self.assertEqual(response.json['type'], 'deadline')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,17 @@
 import json
 import uuid
 import unittest
-import flask_testing
 
-from app import create_app
+from sqlalchemy import inspect
+
+from tests.base import DatabaseTestCase
 from extensions import db
 from models.person import Person, generate_uuid, PersonEncoder, SexEnum
+from models.idempotency import IdempotencyKey
+from models.change import PersonChange, OperationEnum
 
 
-class ModelTests(flask_testing.TestCase):
-
-    def create_app(self):
-        application = create_app(config_name="testing")
-        return application.app
+class ModelTests(DatabaseTestCase):
 
     def setUp(self):
         """Define test variables and initialize app."""
@@ -27,15 +26,7 @@ class ModelTests(flask_testing.TestCase):
             siblingsOrSpousesAboard=0,
             parentsOrChildrenAboard=0
         )
-
-        with self.app.app_context():
-            db.create_all()
-
-    def tearDown(self):
-        """teardown all initialized variables."""
-        with self.app.app_context():
-            db.session.remove()
-            db.drop_all()
+        super().setUp()
 
     def test_person_encoder_uuid(self):
         genrated_uuid = uuid.uuid4()
@@ -48,15 +39,33 @@ class ModelTests(flask_testing.TestCase):
         self.assertDictContainsSubset(data, {'test_enum': genrated_enum.value})
 
     def test_generate_uuid(self):
-        uuid = generate_uuid()
-        self.assertEqual(len(uuid), 36)
-        uuid_part = uuid.split('-')
+        generated_uuid = generate_uuid()
+        self.assertIsInstance(generated_uuid, uuid.UUID)
+        self.assertEqual(generated_uuid.version, 7)
+        self.assertEqual(generated_uuid.variant, uuid.RFC_4122)
+        uuid_part = str(generated_uuid).split('-')
         self.assertEqual(len(uuid_part[0]), 8)
         self.assertEqual(len(uuid_part[1]), 4)
         self.assertEqual(len(uuid_part[2]), 4)
         self.assertEqual(len(uuid_part[3]), 4)
         self.assertEqual(len(uuid_part[4]), 12)
 
+    def test_generate_uuid_is_time_ordered(self):
+        keys = [generate_uuid() for _ in range(10000)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_person_uuid_is_native(self):
+        person = Person.load(**self.person)
+        self.assertEqual(person.uuid, uuid.UUID(self.person['uuid']))
+        person = Person.load(**dict(self.person, uuid=None))
+        person.save()
+        self.assertIsInstance(person.uuid, uuid.UUID)
+
+    def test_person_incorrect_uuid(self):
+        with self.assertRaises(AssertionError):
+            Person.load(**dict(self.person, uuid='not-uuid'))
+
     def test_person_model_repr_representation(self):
         person = Person.load(**self.person)
         self.assertEqual(repr(person), f'<Person {person.name}>')
@@ -77,7 +86,7 @@ class ModelTests(flask_testing.TestCase):
             siblings_or_spouses_aboard=0,
             parents_or_children_aboard=0
         ))
-        self.assertEqual(person.uuid, '4ac063d5-efc3-4d30-aa99-b7e5fe33b845')
+        self.assertEqual(person.uuid, uuid.UUID('4ac063d5-efc3-4d30-aa99-b7e5fe33b845'))
         self.assertEqual(person.age, 40)
         self.assertEqual(person.sex, 'male')
         self.assertEqual(person.fare, 7.25)
@@ -167,6 +176,19 @@ class ModelTests(flask_testing.TestCase):
         person.update(**{'surname': 'Bombs'})
         self.assertFalse(hasattr(person, 'surname'))
 
+    def test_person_model_update_returns_changed_fields(self):
+        person = Person.load(**self.person)
+        self.assertEqual(person.update(name='Alex', age=40, fare=7.25), ['name'])
+        self.assertEqual(person.update(name='Alex'), [])
+        self.assertEqual(person.update(sex=self.person['sex']), [])
+        self.assertEqual(person.update(sex='female'), ['sex'])
+
+    def test_person_model_update_ignores_private_fields(self):
+        person = Person.load(**self.person)
+        self.assertEqual(person.update(uuid=str(uuid.uuid4()), importBatch=2, save=None, query=None), [])
+        self.assertEqual(person.uuid, uuid.UUID(self.person['uuid']))
+        self.assertTrue(callable(person.save))
+
     def test_person_model_save_object(self):
         person = Person.load(**self.person)
         person.save()
@@ -220,6 +242,27 @@ class ModelTests(flask_testing.TestCase):
         example5 = Person.to_snake_case('route53Testing')
         self.assertEqual(example5, 'route53_testing')
 
+    def test_person_model_get_all_loads_only_fields(self):
+        Person.load(**self.person).save()
+        db.session.expunge_all()
+        person = Person.get_all(fields=['name', 'age'])[0]
+        self.assertEqual(inspect(person).unloaded, {'survived', 'passenger_class', 'sex', 'fare', 'import_batch',
+                                                    'siblings_or_spouses_aboard', 'parents_or_children_aboard'})
+        self.assertEqual(person.dump(['name', 'age']), dict(name='John Badduch', age=40))
+
+    def test_person_model_get_loads_only_fields(self):
+        Person.load(**self.person).save()
+        db.session.expunge_all()
+        person = Person.get(self.person['uuid'], fields=['age', 'name'])
+        self.assertEqual(person.dump(['name', 'age']), dict(name='John Badduch', age=40))
+        self.assertIn('fare', inspect(person).unloaded)
+        self.assertIsNone(Person.get(str(generate_uuid())))
+
+    def test_person_model_select_cache_key(self):
+        self.assertEqual(Person.select(['name', 'age'])._cache_key, Person.select(['age', 'name'])._cache_key)
+        self.assertNotEqual(Person.select(['name'])._cache_key, Person.select(['age'])._cache_key)
+        self.assertNotEqual(Person.select()._cache_key, Person.select(['name'])._cache_key)
+
     def test_person_model_dump_object(self):
         p = Person.load(**self.person)
         data = p.dump()
@@ -227,7 +270,7 @@ class ModelTests(flask_testing.TestCase):
 
     def test_person_model_load_object(self):
         person = Person.load(**self.person)
-        self.assertEqual(person.uuid, self.person['uuid'])
+        self.assertEqual(person.uuid, uuid.UUID(self.person['uuid']))
         self.assertEqual(person.age, self.person['age'])
         self.assertEqual(person.sex, self.person['sex'])
         self.assertEqual(person.fare, self.person['fare'])
@@ -237,6 +280,43 @@ class ModelTests(flask_testing.TestCase):
         self.assertEqual(person.siblings_or_spouses_aboard, self.person['siblingsOrSpousesAboard'])
         self.assertEqual(person.parents_or_children_aboard, self.person['parentsOrChildrenAboard'])
 
+    def test_person_model_save_writes_change(self):
+        person = Person.load(**self.person)
+        person.save()
+        change = PersonChange.query.one()
+        self.assertEqual(change.operation, OperationEnum.upsert)
+        self.assertEqual(str(change.person_uuid), self.person['uuid'])
+        self.assertDictContainsSubset(change.payload, self.person)
+
+    def test_person_model_delete_writes_change(self):
+        person = Person.load(**self.person)
+        person.save()
+        person.delete()
+        change = PersonChange.query.order_by(PersonChange.sequence.desc()).first()
+        self.assertEqual(change.operation, OperationEnum.delete)
+        self.assertIsNone(change.payload)
+
+    def test_person_change_token(self):
+        self.assertEqual(PersonChange.parse_token(PersonChange.format_token(10, 2)), (10, 2))
+
+    def test_idempotency_key_hash_request(self):
+        person = dict(reversed(list(self.person.items())))
+        self.assertEqual(IdempotencyKey.hash_request(person), IdempotencyKey.hash_request(self.person))
+        person['age'] = 41
+        self.assertNotEqual(IdempotencyKey.hash_request(person), IdempotencyKey.hash_request(self.person))
+
+    def test_idempotency_key_lookup_expired(self):
+        IdempotencyKey(principal='client', key='key', request_hash='hash', status_code=200, response={}).save()
+        self.assertIsNone(IdempotencyKey.lookup('other', 'key', ttl=60))
+        self.assertIsNotNone(IdempotencyKey.lookup('client', 'key', ttl=60))
+        self.assertIsNone(IdempotencyKey.lookup('client', 'key', ttl=-1))
+        self.assertEqual(IdempotencyKey.query.count(), 0)
+
+    def test_idempotency_key_evict(self):
+        IdempotencyKey(principal='client', key='key', request_hash='hash', status_code=200, response={}).save()
+        self.assertEqual(IdempotencyKey.evict(ttl=60), 0)
+        self.assertEqual(IdempotencyKey.evict(ttl=-1), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
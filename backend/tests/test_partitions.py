@@ -0,0 +1,150 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+import dataset
+import partitions
+from tests.base import DatabaseTestCase
+from extensions import db
+from models import Person, PersonChange
+from models.change import OperationEnum
+
+
+class PartitionsTests(DatabaseTestCase):
+    csv_data = (
+        'Survived,Pclass,Name,Sex,Age,Siblings/Spouses Aboard,Parents/Children Aboard,Fare\n'
+        '0,3,Mr. Owen Harris Braund,male,22,1,0,7.25\n'
+        '1,1,Master. Alden Gates Caldwell,male,0.83,0,2,29\n'
+    )
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = Path(self.folder.name)
+        (self.path / 'people.csv').write_text(self.csv_data)
+        self.person = dict(
+            age=40,
+            sex='male',
+            fare=7.25,
+            name='John Badduch',
+            survived=True,
+            passengerClass=3,
+            siblingsOrSpousesAboard=0,
+            parentsOrChildrenAboard=0
+        )
+        super().setUp()
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_convert_keeps_existing_people(self):
+        Person.load(**self.person).save()
+        self.assertFalse(partitions.is_partitioned())
+        partitions.convert()
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(partitions.get_all(), [partitions.LEGACY_PARTITION])
+        self.assertEqual(Person.query.one().name, self.person['name'])
+
+    def test_convert_moves_rows_of_other_batches(self):
+        Person.load(**self.person).save()
+        dataset.import_file(self.path / 'people.csv', import_batch=2)
+        partitions.convert()
+        self.assertEqual(partitions.get_all(), [partitions.partition_name(2), partitions.LEGACY_PARTITION])
+        self.assertEqual(len(Person.get_all(import_batch=2)), 2)
+        count = db.session.execute(f'SELECT count(*) FROM {partitions.LEGACY_PARTITION}').scalar()
+        self.assertEqual(count, 1)
+
+    def test_no_default_partition(self):
+        partitions.convert()
+        partitions.create(1)
+        default = db.session.execute(
+            "SELECT partdefid FROM pg_partitioned_table WHERE partrelid = 'person'::regclass").scalar()
+        self.assertEqual(default, 0)
+
+    def test_convert_twice(self):
+        partitions.convert()
+        with self.assertRaises(AssertionError):
+            partitions.convert()
+
+    def test_migrations_ignore_partitions(self):
+        partitions.convert()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        dataset.import_file(self.path / 'people.csv', import_batch=2)
+        partitions.detach(2)
+        context = MigrationContext.configure(self.connection, opts={'include_object': partitions.include_object})
+        self.assertEqual(compare_metadata(context, db.metadata), [])
+
+    def test_create_not_partitioned(self):
+        with self.assertRaises(AssertionError):
+            partitions.create(1)
+
+    def test_import_creates_partition(self):
+        partitions.convert()
+        self.assertEqual(dataset.import_file(self.path / 'people.csv', import_batch=1), 2)
+        self.assertTrue(partitions.exists(1))
+        count = db.session.execute(f'SELECT count(*) FROM {partitions.partition_name(1)}').scalar()
+        self.assertEqual(count, 2)
+
+    def test_get_all_by_import_batch(self):
+        Person.load(**self.person).save()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        self.assertEqual(len(Person.get_all()), 3)
+        self.assertEqual(len(Person.get_all(import_batch=1)), 2)
+        self.assertEqual([person.name for person in Person.get_all(import_batch=0)], [self.person['name']])
+        self.assertNotIn('importBatch', Person.get_all(import_batch=1)[0].dump())
+
+    def test_detach_records_deletes(self):
+        partitions.convert()
+        Person.load(**self.person).save()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        partitions.detach(1)
+        self.assertEqual([person.name for person in Person.get_all()], [self.person['name']])
+        self.assertFalse(partitions.exists(1))
+        deleted = PersonChange.query.filter_by(operation=OperationEnum.delete).all()
+        self.assertEqual(len(deleted), 2)
+
+    def test_drop(self):
+        partitions.convert()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        partitions.drop(1)
+        self.assertEqual(Person.query.count(), 0)
+        self.assertEqual(PersonChange.query.filter_by(operation=OperationEnum.delete).count(), 2)
+        with self.assertRaises(AssertionError):
+            partitions.drop(1)
+
+    def test_drop_detached(self):
+        partitions.convert()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        partitions.detach(1)
+        partitions.drop(1)
+        self.assertEqual(PersonChange.query.filter_by(operation=OperationEnum.delete).count(), 2)
+        self.assertIsNone(db.session.execute(f"SELECT to_regclass('{partitions.partition_name(1)}')").scalar())
+
+    def test_add_person_with_uuid_of_other_partition(self):
+        partitions.convert()
+        dataset.import_file(self.path / 'people.csv', import_batch=1)
+        uuid = Person.get_all(import_batch=1)[0].uuid
+        response = self.client.post("/people", data=json.dumps(dict(self.person, uuid=str(uuid))),
+                                    content_type='application/json')
+        self.assert400(response)
+        self.assertEqual(Person.query.filter_by(uuid=uuid).count(), 1)
+
+    def test_import_uuid_of_other_partition(self):
+        partitions.convert()
+        person = Person.load(**self.person)
+        person.save()
+        header, *rows = self.csv_data.splitlines()
+        (self.path / 'uuids.csv').write_text(f'uuid,{header}\n{person.uuid},{rows[0]}\n')
+        with self.assertRaises(AssertionError):
+            dataset.import_file(self.path / 'uuids.csv', import_batch=1)
+        self.assertEqual(Person.query.filter_by(uuid=person.uuid).count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
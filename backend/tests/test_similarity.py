@@ -0,0 +1,147 @@
+import uuid
+import unittest
+from unittest import mock
+
+import similarity
+from tests.base import DatabaseTestCase
+from models import Person, PersonChange
+from models.change import OperationEnum
+
+
+class SimilarityIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.index = similarity.SimilarityIndex(capacity=2)
+        self.keys = [uuid.uuid4() for _ in range(4)]
+
+    def test_upsert_grows_matrix(self):
+        for number, key in enumerate(self.keys):
+            self.index.upsert(key, (1, 20 + number, 10.0, 0, 0, 0.0))
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.matrix.shape[0], 4)
+        self.index.upsert(self.keys[0], (1, 50, 10.0, 0, 0, 0.0))
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.nearest((1, 50, 10.0, 0, 0, 0.0), 1), [(self.keys[0], 0.0)])
+
+    def test_remove_moves_last_row(self):
+        for number, key in enumerate(self.keys):
+            self.index.upsert(key, (1, 20 + number, 10.0, 0, 0, 0.0))
+        self.index.remove(self.keys[0])
+        self.index.remove(uuid.uuid4())
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(self.keys[0], self.index)
+        self.assertEqual(self.index.rows[self.keys[3].bytes], 0)
+        self.assertEqual([key for key, distance in self.index.nearest((1, 23, 10.0, 0, 0, 0.0), 3)],
+                         [self.keys[3], self.keys[2], self.keys[1]])
+
+    def test_normalized_distance(self):
+        # age differs by 10 years, fare by 100, after normalization both are one standard deviation
+        self.index.upsert(self.keys[0], (1, 20, 100.0, 0, 0, 0.0))
+        self.index.upsert(self.keys[1], (1, 30, 100.0, 0, 0, 0.0))
+        self.index.upsert(self.keys[2], (1, 20, 200.0, 0, 0, 0.0))
+        self.index.upsert(self.keys[3], (1, 30, 200.0, 0, 0, 0.0))
+        (first, first_distance), (second, second_distance) = \
+            self.index.nearest((1, 20, 100.0, 0, 0, 0.0), 2, exclude=self.keys[0])
+        self.assertEqual({first, second}, {self.keys[1], self.keys[2]})
+        self.assertAlmostEqual(first_distance, second_distance, places=5)
+
+    def test_nearest_of_empty_index(self):
+        self.assertEqual(self.index.nearest((1, 20, 10.0, 0, 0, 0.0), 5), [])
+
+
+class SimilarityTests(DatabaseTestCase):
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.person = dict(
+            age=40,
+            sex='male',
+            fare=7.25,
+            name='John Badduch',
+            survived=True,
+            passengerClass=3,
+            siblingsOrSpousesAboard=0,
+            parentsOrChildrenAboard=0
+        )
+        super().setUp()
+
+    def add(self, **kwargs):
+        person = Person.load(**dict(self.person, **kwargs))
+        person.save()
+        return person
+
+    def test_similar_people(self):
+        person = self.add()
+        near = self.add(name='Near', age=41)
+        female = self.add(name='Female', sex='female')
+        self.add(name='First class', passengerClass=1, fare=80.0, age=70)
+        response = self.client.get(f"/people/{person.uuid}/similar?k=2")
+        self.assert200(response)
+        self.assertEqual([item['uuid'] for item in response.json], [str(near.uuid), str(female.uuid)])
+
+    def test_similar_people_fields(self):
+        person = self.add()
+        self.add(name='Older', age=60)
+        response = self.client.get(f"/people/{person.uuid}/similar?fields=name")
+        self.assert200(response)
+        self.assertEqual(response.json, [dict(name='Older')])
+
+    def test_similar_person_not_found(self):
+        self.assert404(self.client.get(f"/people/{uuid.uuid4()}/similar"))
+
+    def test_incorrect_k(self):
+        person = self.add()
+        self.assert400(self.client.get(f"/people/{person.uuid}/similar?k=0"))
+
+    def test_index_updated_on_save_and_delete(self):
+        person = self.add()
+        index = similarity.get_index()
+        older = self.add(name='Older', age=60)
+        self.assertIn(older.uuid, index)
+        older.update(age=41)
+        older.save()
+        self.assertEqual(index.matrix[index.rows[older.uuid.bytes]][1], 41)
+        older.delete()
+        self.assertNotIn(older.uuid, index)
+        self.assertEqual(len(index), 1)
+
+    def test_index_catches_up_with_outbox(self):
+        person = self.add()
+        index = similarity.get_index()
+        key = uuid.uuid4()
+        # change made by another worker, only the outbox tells about it
+        payload = dict(self.person, uuid=str(key), name='Other')
+        self.session.add(PersonChange(person_uuid=key, operation=OperationEnum.upsert, payload=payload))
+        self.session.flush()
+        self.assertNotIn(key, index)
+        similarity.get_index()
+        self.assertIn(key, index)
+        self.session.add(PersonChange(person_uuid=person.uuid, operation=OperationEnum.delete))
+        self.session.flush()
+        similarity.get_index()
+        self.assertNotIn(person.uuid, index)
+
+    def test_index_rebuilt_after_many_changes(self):
+        similarity.get_index()
+        self.add()
+        self.add(name='Older', age=60)
+        index = self.app.extensions['similarity']
+        index.clear()
+        index.token = '0.0'
+        with mock.patch.dict(self.app.config, SIMILARITY_REBUILD_THRESHOLD=2), \
+                mock.patch.object(index, 'rebuild', wraps=index.rebuild) as rebuild:
+            similarity.get_index()
+        rebuild.assert_called_once()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.token, PersonChange.get_last_token())
+
+    def test_invalidate_index(self):
+        index = similarity.get_index()
+        self.assertIsNotNone(index.token)
+        similarity.invalidate()
+        self.assertIsNone(index.token)
+        self.assertEqual(len(index), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import tracing
+from tests.base import DatabaseTestCase
+from models import Person
+
+
+class TracingTests(DatabaseTestCase):
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.person = dict(
+            age=40,
+            sex='male',
+            fare=7.25,
+            name='John Badduch',
+            survived=True,
+            passengerClass=3,
+            siblingsOrSpousesAboard=0,
+            parentsOrChildrenAboard=0
+        )
+        super().setUp()
+        self.exporter = InMemorySpanExporter()
+        self.addCleanup(self.app.extensions.__setitem__, 'tracing', self.app.extensions['tracing'])
+        self.app.extensions['tracing'] = tracing.create_tracer(self.app.config, SimpleSpanProcessor(self.exporter))
+
+    def spans(self):
+        return {span.name: span for span in self.exporter.get_finished_spans()}
+
+    def test_request_spans(self):
+        obj = Person.load(**self.person)
+        obj.save()
+        self.exporter.clear()
+        response = self.client.get(f"/people/{obj.uuid}?fields=name")
+        self.assert200(response)
+        spans = self.spans()
+        request_span = spans['GET /people/<uuid>']
+        self.assertEqual(request_span.attributes['http.status_code'], 200)
+        for name in ('connexion validate parameters', 'handler api.person.get', 'SELECT',
+                     'Person.dump', 'connexion validate response'):
+            self.assertEqual(spans[name].context.trace_id, request_span.context.trace_id)
+        self.assertEqual(spans['handler api.person.get'].parent.span_id, request_span.context.span_id)
+        self.assertEqual(spans['SELECT'].parent.span_id, spans['handler api.person.get'].context.span_id)
+
+    def test_body_validation_span(self):
+        response = self.client.post("/people", data=json.dumps(self.person), content_type='application/json')
+        self.assert200(response)
+        self.assertIn('connexion validate body', self.spans())
+        self.assertIn('INSERT', self.spans())
+
+    def test_continue_trace_from_header(self):
+        headers = {'traceparent': f'00-{self.trace_id}-00f067aa0ba902b7-01'}
+        self.assert200(self.client.get("/people", headers=headers))
+        request_span = self.spans()['GET /people']
+        self.assertEqual(format(request_span.context.trace_id, '032x'), self.trace_id)
+        self.assertEqual(format(request_span.parent.span_id, '016x'), '00f067aa0ba902b7')
+
+    def test_not_sampled_trace_from_header(self):
+        headers = {'traceparent': f'00-{self.trace_id}-00f067aa0ba902b7-00'}
+        self.assert200(self.client.get("/people", headers=headers))
+        self.assertEqual(self.exporter.get_finished_spans(), ())
+
+    def test_disabled_tracing(self):
+        self.app.extensions['tracing'] = None
+        self.assert200(self.client.get("/people"))
+        self.assertEqual(self.exporter.get_finished_spans(), ())
+
+    def test_file_exporter(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = Path(folder) / 'traces.jsonl'
+            exporter = tracing.create_exporter(dict(TRACING_EXPORTER='file', TRACING_FILE=str(filename)))
+            self.app.extensions['tracing'] = tracing.create_tracer(self.app.config, SimpleSpanProcessor(exporter))
+            self.assert200(self.client.get("/people"))
+            exporter.shutdown()
+            names = [json.loads(line)['name'] for line in filename.read_text().splitlines()]
+        self.assertIn('GET /people', names)
+
+    def test_incorrect_exporter(self):
+        with self.assertRaises(ValueError):
+            tracing.create_exporter(dict(TRACING_EXPORTER='jaeger'))
+
+
+if __name__ == '__main__':
+    unittest.main()
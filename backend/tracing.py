@@ -0,0 +1,182 @@
+"""
+OpenTelemetry tracing of requests: connexion validation, resolved handler, SQL statements and serialization.
+
+Incoming W3C `traceparent` / `tracestate` headers are continued, so spans of one request made across pods end up
+in one trace. Spans are exported to console or to a file with one JSON span per line (`TRACING_EXPORTER`), only
+`TRACING_SAMPLE_RATIO` of new traces are recorded. When tracing is disabled every hook returns immediately.
+"""
+import functools
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from opentelemetry import context, trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from connexion.decorators.response import ResponseValidator
+from connexion.decorators.validation import ParameterValidator, RequestBodyValidator
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+SERVICE_NAME = 'titanic'
+EXPORTERS = ('none', 'console', 'file')
+
+
+def create_exporter(config):
+    name = config['TRACING_EXPORTER']
+    if name == 'console':
+        return ConsoleSpanExporter(service_name=SERVICE_NAME)
+    if name == 'file':
+        return ConsoleSpanExporter(service_name=SERVICE_NAME,
+                                   out=open(config['TRACING_FILE'], 'a'),
+                                   formatter=lambda span: span.to_json(indent=None) + '\n')
+    if name == 'none':
+        return None
+    raise ValueError(f'Incorrect `TRACING_EXPORTER` {name}, supported: {", ".join(EXPORTERS)}')
+
+
+def create_tracer(config, span_processor=None):
+    """Return tracer of own provider (app doesn't touch the global one) or None if tracing is disabled."""
+    if span_processor is None:
+        exporter = create_exporter(config)
+        if exporter is None:
+            return None
+        span_processor = BatchSpanProcessor(exporter)
+    provider = TracerProvider(resource=Resource.create({'service.name': SERVICE_NAME}),
+                              sampler=ParentBased(TraceIdRatioBased(config['TRACING_SAMPLE_RATIO'])))
+    provider.add_span_processor(span_processor)
+    return provider.get_tracer(__name__)
+
+
+def get_tracer():
+    return current_app.extensions.get('tracing') if has_app_context() else None
+
+
+@contextmanager
+def span(name, **attributes):
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def traced(function, operation):
+    """Run function (handler resolved by connexion) in own span."""
+    name = f'{function.__module__}.{function.__name__}'
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(f'handler {name}', **{'code.function': name}):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def start_request():
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.tracing_span = tracer.start_span(f'{request.method} {rule}', context=extract(request.headers),
+                                       kind=trace.SpanKind.SERVER,
+                                       attributes={'http.method': request.method, 'http.route': rule,
+                                                   'http.target': request.full_path})
+    g.tracing_token = context.attach(trace.set_span_in_context(g.tracing_span))
+
+
+def finish_response(response):
+    if 'tracing_span' in g:
+        g.tracing_span.set_attribute('http.status_code', response.status_code)
+    return response
+
+
+def finish_request(error=None):
+    current = g.pop('tracing_span', None)
+    if current is None:
+        return
+    if error is not None:
+        current.record_exception(error)
+        current.set_status(trace.Status(trace.StatusCode.ERROR))
+    current.end()
+    context.detach(g.pop('tracing_token'))
+
+
+def start_statement(conn, cursor, statement, parameters, execution_context, executemany):
+    tracer = get_tracer()
+    if tracer is None or execution_context is None:
+        return
+    execution_context._tracing_span = tracer.start_span(
+        statement.split(None, 1)[0] if statement else 'SQL', kind=trace.SpanKind.CLIENT,
+        attributes={'db.system': 'postgresql', 'db.statement': statement})
+
+
+def finish_statement(conn, cursor, statement, parameters, execution_context, executemany):
+    current = getattr(execution_context, '_tracing_span', None)
+    if current is not None:
+        current.end()
+        execution_context._tracing_span = None
+
+
+def fail_statement(exception_context):
+    current = getattr(exception_context.execution_context, '_tracing_span', None)
+    if current is not None:
+        current.record_exception(exception_context.original_exception)
+        current.set_status(trace.Status(trace.StatusCode.ERROR))
+        current.end()
+        exception_context.execution_context._tracing_span = None
+
+
+class TracedParameterValidator(ParameterValidator):
+    def __call__(self, function):
+        validate = super().__call__(lambda request: None)
+
+        @functools.wraps(function)
+        def wrapper(request):
+            with span('connexion validate parameters'):
+                problem = validate(request)
+            if problem is not None:
+                return problem
+            return function(request)
+        return wrapper
+
+
+class TracedRequestBodyValidator(RequestBodyValidator):
+    def __call__(self, function):
+        validate = super().__call__(lambda request: None)
+
+        @functools.wraps(function)
+        def wrapper(request):
+            with span('connexion validate body'):
+                problem = validate(request)
+            if problem is not None:
+                return problem
+            return function(request)
+        return wrapper
+
+
+class TracedResponseValidator(ResponseValidator):
+    def validate_response(self, data, status_code, headers, url):
+        with span('connexion validate response', **{'http.status_code': status_code}):
+            return super().validate_response(data, status_code, headers, url)
+
+
+VALIDATOR_MAP = {
+    'parameter': TracedParameterValidator,
+    'body': TracedRequestBodyValidator,
+    'response': TracedResponseValidator,
+}
+
+
+def init_app(app):
+    app.extensions['tracing'] = create_tracer(app.config)
+    app.before_request(start_request)
+    app.after_request(finish_response)
+    app.teardown_request(finish_request)
+    if not event.contains(Engine, 'before_cursor_execute', start_statement):
+        event.listen(Engine, 'before_cursor_execute', start_statement)
+        event.listen(Engine, 'after_cursor_execute', finish_statement)
+        event.listen(Engine, 'handle_error', fail_statement)